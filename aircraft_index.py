@@ -0,0 +1,168 @@
+import math
+import time
+
+# Aircraft seen at the airport, one row per registration, and visits per aircraft type, both kept
+# up to date by triggers on flights. A visit is an arrival that has landed (it has an actual time):
+# scheduled flights that never operate don't count, and a turnaround (arrival plus departure) counts
+# once. A flight updates its aircraft's details as soon as it has a registration (scheduled flights
+# often get theirs late), and counts as a visit of the aircraft once it has one and of its type
+# once it has a model code. Rarity is computed from these small tables, never from the flights history.
+def visit(row):
+    return f"({row}.flight_type IS 'arrival' AND {row}.actual_time IS NOT NULL)"
+
+
+aircraft_upsert = '''
+        ON CONFLICT DO UPDATE SET
+            visits = visits + excluded.visits,
+            aircraft_hex = COALESCE(excluded.aircraft_hex, aircraft_hex),
+            model_code = COALESCE(excluded.model_code, model_code),
+            aircraft_model = COALESCE(excluded.aircraft_model, aircraft_model),
+            owner_name = COALESCE(excluded.owner_name, owner_name),
+            first_seen = MIN(first_seen, excluded.first_seen),
+            last_seen = MAX(last_seen, excluded.last_seen);
+'''
+
+aircraft_table = f'''
+    CREATE TABLE aircraft (
+        registration TEXT PRIMARY KEY,
+        aircraft_hex TEXT,
+        model_code TEXT,
+        aircraft_model TEXT,
+        owner_name TEXT,
+        first_seen INTEGER,
+        last_seen INTEGER,
+        visits INTEGER
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_aircraft_hex ON aircraft (aircraft_hex);
+
+    CREATE TABLE aircraft_types (
+        model_code TEXT PRIMARY KEY,
+        visits INTEGER
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER aircraft_visits_insert AFTER INSERT ON flights
+    WHEN NEW.registration IS NOT NULL AND NEW.registration != ''
+    BEGIN
+        INSERT INTO aircraft VALUES (NEW.registration, NEW.aircraft_hex, NEW.model_code, NEW.aircraft_model, NEW.owner_name,
+                                     NEW.scheduled_time, NEW.scheduled_time, {visit('NEW')})
+        {aircraft_upsert}
+    END;
+
+    CREATE TRIGGER aircraft_visits_update AFTER UPDATE OF registration, actual_time, flight_type ON flights
+    WHEN OLD.registration IS NOT NEW.registration OR {visit('OLD')} IS NOT {visit('NEW')}
+    BEGIN
+        UPDATE aircraft SET visits = visits - 1 WHERE registration = OLD.registration AND {visit('OLD')};
+        INSERT INTO aircraft
+        SELECT NEW.registration, NEW.aircraft_hex, NEW.model_code, NEW.aircraft_model, NEW.owner_name,
+               NEW.scheduled_time, NEW.scheduled_time, {visit('NEW')}
+        WHERE NEW.registration IS NOT NULL AND NEW.registration != ''
+        {aircraft_upsert}
+    END;
+
+    CREATE TRIGGER aircraft_visits_delete AFTER DELETE ON flights
+    WHEN {visit('OLD')}
+    BEGIN
+        UPDATE aircraft SET visits = visits - 1 WHERE registration = OLD.registration;
+        UPDATE aircraft_types SET visits = visits - 1 WHERE model_code = OLD.model_code;
+    END;
+
+    CREATE TRIGGER aircraft_types_visits_insert AFTER INSERT ON flights
+    WHEN NEW.model_code IS NOT NULL AND NEW.model_code != '' AND {visit('NEW')}
+    BEGIN
+        INSERT INTO aircraft_types VALUES (NEW.model_code, 1)
+        ON CONFLICT DO UPDATE SET visits = visits + 1;
+    END;
+
+    CREATE TRIGGER aircraft_types_visits_update AFTER UPDATE OF model_code, actual_time, flight_type ON flights
+    WHEN OLD.model_code IS NOT NEW.model_code OR {visit('OLD')} IS NOT {visit('NEW')}
+    BEGIN
+        UPDATE aircraft_types SET visits = visits - 1 WHERE model_code = OLD.model_code AND {visit('OLD')};
+        INSERT INTO aircraft_types SELECT NEW.model_code, 1
+        WHERE NEW.model_code IS NOT NULL AND NEW.model_code != '' AND {visit('NEW')}
+        ON CONFLICT DO UPDATE SET visits = visits + 1;
+    END;
+'''
+
+# Everything a rebuild drops: the tables, these triggers and those of the first definition,
+# which counted every inserted flight as a visit
+aircraft_objects = [('TRIGGER', name) for name in ('aircraft_insert', 'aircraft_update', 'aircraft_delete', 'aircraft_types_insert',
+                                                   'aircraft_types_update', 'aircraft_visits_insert', 'aircraft_visits_update',
+                                                   'aircraft_visits_delete', 'aircraft_types_visits_insert',
+                                                   'aircraft_types_visits_update')] + [('TABLE', 'aircraft'), ('TABLE', 'aircraft_types')]
+
+# Weight of how rarely this airframe visits, next to how rare its type is
+airframe_weight = 0.5
+
+# Bonus for a flight operated by someone else than the airline it's sold under (wet lease,
+# charter or a special livery), in the same units as the rarity
+other_operator_bonus = 1.0
+
+
+# Function to create the aircraft tables and their triggers, filling them from the flights already
+# stored. Tables built by the first definition (visits counted per inserted flight) are rebuilt.
+def create_aircraft_table(conn):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='aircraft_visits_insert'").fetchone():
+        return
+    conn.executescript(f'''
+        BEGIN;
+        {''.join(f'DROP {kind} IF EXISTS {name};' for kind, name in aircraft_objects)}
+        {aircraft_table}
+        INSERT INTO aircraft
+        SELECT registration, MAX(aircraft_hex), MAX(model_code), MAX(aircraft_model), MAX(owner_name),
+               MIN(scheduled_time), MAX(scheduled_time), SUM({visit('flights')})
+        FROM flights WHERE registration IS NOT NULL AND registration != ''
+        GROUP BY registration;
+        INSERT INTO aircraft_types
+        SELECT model_code, COUNT(*) FROM flights WHERE model_code IS NOT NULL AND model_code != '' AND {visit('flights')}
+        GROUP BY model_code;
+        COMMIT;
+    ''')
+
+
+# Function to score how rare a sighting is, in bits: how unusual the type is among all type visits,
+# plus (weighted) how unusual this airframe is among all aircraft visits when its registration is
+# known, plus a bonus for an unexpected operator. Counts are smoothed by one.
+def rarity_score(type_visits, total_type_visits, aircraft_visits=None, total_aircraft_visits=0, other_operator=False):
+    score = -math.log2((type_visits + 1) / (total_type_visits + 1))
+    if aircraft_visits is not None:
+        score += airframe_weight * -math.log2((aircraft_visits + 1) / (total_aircraft_visits + 1))
+    return score + (other_operator_bonus if other_operator else 0)
+
+
+# Function to rank the flights scheduled in the next `hours` hours by rarity, rarest first.
+# Reads the upcoming flights through the scheduled_time index and looks up their aircraft and
+# type by primary key.
+def rank_upcoming_by_rarity(conn, now=None, hours=24, limit=10):
+    now = int(time.time()) if now is None else now
+    total_aircraft_visits = conn.execute('SELECT COALESCE(SUM(visits), 0) FROM aircraft').fetchone()[0]
+    total_type_visits = conn.execute('SELECT COALESCE(SUM(visits), 0) FROM aircraft_types').fetchone()[0]
+    rows = conn.execute('''
+        SELECT f.flight_type, f.callsign, f.airline, f.origin_or_destination, f.scheduled_time, f.local_timezone,
+               f.registration, f.model_code, f.aircraft_model, f.owner_name, a.visits, a.first_seen, t.visits
+        FROM flights f
+        LEFT JOIN aircraft a ON a.registration = f.registration
+        LEFT JOIN aircraft_types t ON t.model_code = f.model_code
+        WHERE f.scheduled_time > ? AND f.scheduled_time <= ?
+    ''', (now, now + hours * 3600)).fetchall()
+
+    ranked = []
+    for row in rows:
+        (flight_type, callsign, airline, endpoint, scheduled_time, timezone,
+         registration, model_code, aircraft_model, owner_name, visits, first_seen, type_visits) = row
+        other_operator = bool(owner_name and airline and owner_name != airline)
+        ranked.append({
+            'flight_type': flight_type,
+            'callsign': callsign,
+            'origin_or_destination': endpoint,
+            'scheduled_time': scheduled_time,
+            'local_timezone': timezone,
+            'registration': registration,
+            'aircraft_model': aircraft_model or model_code,
+            'owner_name': owner_name,
+            'visits': visits or 0,
+            'first_seen': first_seen,
+            'rarity': rarity_score(type_visits or 0, total_type_visits, visits if registration else None,
+                                   total_aircraft_visits, other_operator) if model_code else 0.0,
+        })
+    ranked.sort(key=lambda flight: (-flight['rarity'], flight['scheduled_time']))
+    return ranked[:limit]
@@ -0,0 +1,174 @@
+import re
+import numpy as np
+import pandas as pd
+from weighted_window import find_weighted_windows
+
+# Weather and runways from the pluginData blocks of the airport.json snapshots, which come with
+# every schedule download anyway. One weather row is kept per METAR (both snapshots of a poll
+# carry the same one), with the runway in use worked out from the wind.
+weather_table = '''
+    CREATE TABLE weather (
+        observed_time INTEGER PRIMARY KEY,
+        metar TEXT,
+        visibility_m INTEGER,
+        weather_codes TEXT,
+        precipitation INTEGER,
+        wind_direction INTEGER,
+        wind_speed_kts INTEGER,
+        temperature_c INTEGER,
+        flight_category TEXT,
+        runway TEXT
+    ) WITHOUT ROWID;
+
+    CREATE TABLE runways (
+        name TEXT PRIMARY KEY,
+        heading INTEGER,
+        length_m INTEGER,
+        surface TEXT
+    ) WITHOUT ROWID;
+'''
+
+# Below this wind speed (knots) the runway in use isn't changed, so the last one is kept
+calm_wind = 3
+
+# Visibility (metres) from which the weather doesn't lower a window's score; below it the
+# score falls in proportion, down to min_weather_factor
+good_visibility = 8000
+min_weather_factor = 0.1
+
+# Factor applied to movements during precipitation (rain, snow, drizzle, hail, ...)
+precipitation_factor = 0.5
+
+# How long (seconds) an observation is assumed to hold. Windows further away from the last
+# observation than this aren't down- or upweighted, there's no forecast in the snapshots.
+weather_persistence = 3 * 60 * 60
+
+# METAR present weather groups, e.g. -RA, +SHSN, VCTS, BR, MIFG
+_weather_group = re.compile(r'^(\+|-|VC)?(MI|PR|BC|DR|BL|SH|TS|FZ)?(DZ|RA|SN|SG|IC|PL|GR|GS|UP|BR|FG|FU|VA|DU|SA|HZ|PY|PO|SQ|FC|SS|DS)+$')
+_precipitation = re.compile(r'DZ|RA|SN|SG|IC|PL|GR|GS|UP')
+_compass_points = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+
+
+# Function to create the weather and runways tables
+def create_weather_tables(conn):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='weather'").fetchone():
+        return
+    conn.executescript(weather_table)
+
+
+# Function to read the prevailing visibility (metres) and the present weather groups from a METAR.
+# Only the observation part is read, not the TEMPO/BECMG trends after it.
+def parse_metar(metar):
+    visibility = None
+    codes = []
+    for token in (metar or '').split()[1:]:
+        if token in ('TEMPO', 'BECMG', 'NOSIG', 'RMK'):
+            break
+        if token == 'CAVOK':
+            visibility = 10000
+        elif visibility is None and re.fullmatch(r'\d{4}(NDV)?', token):
+            # 9999 means 10 km or more
+            visibility = 10000 if token.startswith('9999') else int(token[:4])
+        elif _weather_group.match(token):
+            codes.append(token)
+    return visibility, ' '.join(codes) or None
+
+
+# Function to get a runway's magnetic heading in degrees from its name, e.g. '19' -> 190
+def runway_heading(name):
+    digits = re.match(r'\d+', name or '')
+    return int(digits.group()) * 10 if digits else None
+
+
+# Function to pick the runway in use: the one with the strongest headwind. In calm or variable
+# wind the previous runway is kept (None if there's none yet).
+def active_runway(runways, wind_direction, wind_speed, previous=None):
+    if wind_direction is None or not wind_speed or wind_speed < calm_wind or not runways:
+        return previous
+    return max(runways, key=lambda runway: np.cos(np.radians(wind_direction - runway[1])))[0]
+
+
+# Function to describe where movements on a runway come from and go to, to know which end to stand at
+def runway_sides(runway):
+    heading = runway_heading(runway)
+    if heading is None:
+        return ''
+    approach = _compass_points[round(((heading + 180) % 360) / 45) % 8]
+    climb_out = _compass_points[round(heading / 45) % 8]
+    return f"arrivals from the {approach}, departures to the {climb_out}"
+
+
+# Function to store the weather and runways blocks of one snapshot (as read by
+# snapshot_reader.read_object_fields); a METAR already stored is skipped
+def save_plugin_data(conn, plugin_data):
+    runways = plugin_data.get('runways') or []
+    if runways:
+        conn.executemany('INSERT OR REPLACE INTO runways VALUES (?, ?, ?, ?)', [
+            (runway.get('name'), runway_heading(runway.get('name')),
+             (runway.get('length') or {}).get('m'), (runway.get('surface') or {}).get('code'))
+            for runway in runways])
+
+    weather = plugin_data.get('weather') or {}
+    if not weather.get('time'):
+        return
+    wind = weather.get('wind') or {}
+    wind_direction = (wind.get('direction') or {}).get('degree')
+    wind_speed = (wind.get('speed') or {}).get('kts')
+    visibility, codes = parse_metar(weather.get('metar'))
+    previous = conn.execute('SELECT runway FROM weather WHERE observed_time < ? ORDER BY observed_time DESC LIMIT 1',
+                            (weather['time'],)).fetchone()
+    runway_headings = conn.execute('SELECT name, heading FROM runways WHERE heading IS NOT NULL').fetchall()
+    conn.execute('INSERT OR IGNORE INTO weather VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+        weather['time'], weather.get('metar'), visibility, codes, int(bool(codes and _precipitation.search(codes))),
+        wind_direction, wind_speed, (weather.get('temp') or {}).get('celsius'), (weather.get('flight') or {}).get('category'),
+        active_runway(runway_headings, wind_direction, wind_speed, previous[0] if previous else None)))
+
+
+# Function to turn visibility (metres) and precipitation flags into score factors, vectorized.
+# An unknown visibility counts as good.
+def weather_factor(visibility, precipitation):
+    visibility = np.asarray(visibility, dtype=float)
+    factor = np.clip(np.where(np.isnan(visibility), good_visibility, visibility) / good_visibility, min_weather_factor, 1)
+    return factor * np.where(np.asarray(precipitation, dtype=float) > 0, precipitation_factor, 1)
+
+
+# Function to look up the weather at epoch times: the last observation before each time, marked
+# fresh unless it's older than weather_persistence, in which case the factor is 1. The runway is
+# always the last known one.
+def weather_at(conn, times):
+    times = np.asarray(times, dtype=np.int64)
+    columns = ['observed_time', 'visibility_m', 'weather_codes', 'precipitation', 'runway']
+    if len(times) == 0:
+        return pd.DataFrame(columns=columns + ['fresh', 'weather_factor'])
+    observations = pd.read_sql_query(f'''
+        SELECT {', '.join(columns)} FROM weather
+        WHERE observed_time >= (SELECT COALESCE(MAX(observed_time), 0) FROM weather WHERE observed_time <= ?)
+          AND observed_time <= ?
+        ORDER BY observed_time
+    ''', conn, params=(int(times.min()), int(times.max())))
+
+    positions = np.searchsorted(observations['observed_time'].to_numpy(), times, side='right') - 1
+    known = positions >= 0
+    result = observations.iloc[np.where(known, positions, 0)].reset_index(drop=True) if len(observations) else \
+        pd.DataFrame(np.nan, index=range(len(times)), columns=columns)
+    result.loc[~known, columns] = np.nan
+    result['fresh'] = fresh = known & (times - result['observed_time'].fillna(0).to_numpy() <= weather_persistence)
+    result['weather_factor'] = np.where(fresh, weather_factor(result['visibility_m'], result['precipitation']), 1.0)
+    return result
+
+
+# Function to rank windows like weighted_window.find_weighted_windows with every flight's weight
+# multiplied by the weather factor at its time. Each window also gets the weather at its start
+# (None if there's no fresh observation) and the runway last known to be in use.
+def find_weather_windows(conn, flights, window_minutes, k=1, time_column='predicted_time', **kwargs):
+    flights = flights.dropna(subset=[time_column]).reset_index(drop=True)
+    flights['weather_factor'] = weather_at(conn, flights[time_column])['weather_factor'].to_numpy()
+    windows = find_weighted_windows(flights, window_minutes, k, time_column=time_column, factor_column='weather_factor', **kwargs)
+    if windows:
+        at_start = weather_at(conn, [window['start'] for window in windows])
+        for window, weather in zip(windows, at_start.itertuples()):
+            window['visibility_m'] = int(weather.visibility_m) if weather.fresh and not pd.isna(weather.visibility_m) else None
+            window['weather_codes'] = weather.weather_codes if weather.fresh and isinstance(weather.weather_codes, str) else None
+            window['weather_factor'] = weather.weather_factor
+            window['runway'] = weather.runway if isinstance(weather.runway, str) else None
+    return windows
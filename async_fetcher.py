@@ -0,0 +1,103 @@
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Responses worth retrying: rate limiting and temporary server errors
+retry_statuses = {429, 500, 502, 503, 504}
+
+
+# Per-host pacing: each request to a host starts a random pause after the previous one started
+class HostRateLimiter:
+    def __init__(self, min_pause, max_pause, clock=time.monotonic, sleep=asyncio.sleep):
+        self.min_pause = min_pause
+        self.max_pause = max_pause
+        self.clock = clock
+        self.sleep = sleep
+        self.next_start = {}
+        self.locks = {}
+
+    async def wait(self, host):
+        lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            delay = self.next_start.get(host, 0) - self.clock()
+            if delay > 0:
+                print(f"Waiting for {delay:.0f} seconds before the next request to {host}...")
+                await self.sleep(delay)
+            self.next_start[host] = self.clock() + random.uniform(self.min_pause, self.max_pause)
+
+
+# Fetcher running blocking requests on worker threads over one pooled keep-alive session,
+# with bounded concurrency, per-host pacing, retries and conditional requests
+class AsyncFetcher:
+    def __init__(self, headers, max_concurrency=2, min_pause=70, max_pause=360, retries=3, backoff=5, timeout=30):
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.limiter = HostRateLimiter(min_pause, max_pause)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # ETag / Last-Modified of the last good response for every request key
+        self.validators = {}
+
+    def close(self):
+        self.session.close()
+
+    # Blocking part of a request, run on a worker thread
+    def _get(self, key, url):
+        headers = {}
+        validators = self.validators.get(key, {})
+        if 'ETag' in validators:
+            headers['If-None-Match'] = validators['ETag']
+        if 'Last-Modified' in validators:
+            headers['If-Modified-Since'] = validators['Last-Modified']
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        data = None
+        if response.status_code == 200:
+            data = response.json()
+            self.validators[key] = {name: response.headers[name]
+                                    for name in ('ETag', 'Last-Modified') if name in response.headers}
+        return response, data
+
+    # Function to fetch one JSON document; returns None when the server says it is unchanged (304).
+    # The url may be a callable so that time-dependent URLs are built right before sending.
+    async def fetch_json(self, key, url):
+        for attempt in range(self.retries + 1):
+            request_url = url() if callable(url) else url
+            await self.limiter.wait(urlsplit(request_url).netloc)
+
+            retry_after = None
+            async with self.semaphore:
+                try:
+                    response, data = await asyncio.to_thread(self._get, key, request_url)
+                except requests.exceptions.RequestException as e:
+                    error = e
+                else:
+                    if response.status_code == 304:
+                        return None
+                    if response.status_code not in retry_statuses:
+                        response.raise_for_status()
+                        return data
+                    error = requests.exceptions.HTTPError(f"{response.status_code} Error for url: {request_url}",
+                                                          response=response)
+                    retry_after = response.headers.get('Retry-After')
+
+            if attempt == self.retries:
+                raise error
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff * 2 ** attempt
+            delay *= random.uniform(1, 1.5)
+            print(f"Request for {key} failed ({error}), retrying in {delay:.0f} seconds...")
+            await asyncio.sleep(delay)
+
+    # Function to fetch several (key, url) jobs concurrently; failed jobs map to their exception
+    async def fetch_many(self, jobs):
+        results = await asyncio.gather(*(self.fetch_json(key, url) for key, url in jobs), return_exceptions=True)
+        return dict(zip((key for key, url in jobs), results))
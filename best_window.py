@@ -0,0 +1,69 @@
+import numpy as np
+
+
+# Function to count, for every sorted time t, the flights scheduled in [t, t + window)
+def window_counts(sorted_times, window):
+    first = np.searchsorted(sorted_times, sorted_times, side='left')
+    last = np.searchsorted(sorted_times, sorted_times + window, side='left')
+    return first, last
+
+
+# Function to find the top-k non-overlapping time windows with the most flights.
+# Times are sorted once and every window is counted with a binary search, so the
+# whole search is O(n log n) instead of re-filtering all flights for every flight.
+# Ties are broken by the original position of the flight, which matches the old
+# iterrows() loop that kept the first window with the highest count.
+def find_best_windows(times, window_minutes, k=1):
+    # tz-aware pandas columns are searched on their UTC instants, so a window keeps
+    # its real length across DST changes; returned times are then UTC
+    if getattr(getattr(times, 'dt', None), 'tz', None) is not None:
+        times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    values = np.asarray(times, dtype='datetime64[ns]')
+    window = np.timedelta64(int(window_minutes * 60), 's')
+
+    # Flights without a time can't start or fall into a window
+    positions = np.flatnonzero(~np.isnat(values))
+    order = positions[np.argsort(values[positions], kind='stable')]
+    sorted_times = values[order]
+
+    first, last = window_counts(sorted_times, window)
+    counts = last - first
+
+    # Rank by highest count first, then by original position
+    ranking = np.lexsort((order, -counts))
+
+    windows = []
+    for i in pick_non_overlapping(sorted_times, ranking, window, k):
+        windows.append({
+            'start': sorted_times[i],
+            'end': sorted_times[i] + window,
+            'count': int(counts[i]),
+            'positions': order[first[i]:last[i]],
+        })
+    return windows
+
+
+# Function to walk window starts in ranking order and keep the first k that don't overlap
+def pick_non_overlapping(starts, ranking, window, k):
+    picked = []
+    for i in ranking:
+        if len(picked) == k:
+            break
+        if any(abs(starts[i] - starts[j]) < window for j in picked):
+            continue
+        picked.append(i)
+    return picked
+
+
+# Function to find the top-k non-overlapping windows from pre-aggregated counts, e.g. a
+# per-minute rollup: starts are sorted bucket starts and counts the flights in each bucket.
+# A prefix sum turns every window total into two lookups. Ties go to the earliest window.
+def find_best_windows_from_counts(starts, counts, window, k=1):
+    starts = np.asarray(starts)
+    prefix = np.concatenate(([0], np.cumsum(counts)))
+    last = np.searchsorted(starts, starts + window, side='left')
+    totals = prefix[last] - prefix[:-1]
+
+    ranking = np.lexsort((starts, -totals))
+    return [{'start': starts[i], 'end': starts[i] + window, 'count': totals[i].item()}
+            for i in pick_non_overlapping(starts, ranking, window, k)]
@@ -0,0 +1,230 @@
+import sys
+import numpy as np
+import pandas as pd
+from best_window import find_best_windows_from_counts
+from flight_db import connect
+
+# Delay model: how late (actual_time - scheduled_time) flights move, per flight type, airline,
+# origin/destination and hour of day (UTC). Sums per group are kept in delay_stats by triggers,
+# so the model is refreshed with every ingest; small groups are shrunk towards their parent group.
+db_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/vilnius_airport.db'
+
+# Delays are clipped to this range (seconds), so a few diverted or overnight flights don't skew a group
+min_delay = -60 * 60
+max_delay = 4 * 60 * 60
+
+# Weight (in flights) of the parent group's mean when shrinking a group's mean towards it
+prior_weight = 5
+
+# Groups from the most general to the most specific
+group_levels = [
+    ['flight_type'],
+    ['flight_type', 'airline'],
+    ['flight_type', 'airline', 'origin_or_destination'],
+    ['flight_type', 'airline', 'origin_or_destination', 'hour'],
+]
+
+# How long before now a flight may be scheduled and still be predicted to move after now
+lookback = 4 * 60 * 60
+
+# Per-group delay sums, with triggers adding and removing a flight whenever its actual_time is
+# set or changed. airline and origin_or_destination are stored as '' when missing.
+delay_stats_table = f'''
+    CREATE TABLE delay_stats (
+        flight_type TEXT,
+        airline TEXT,
+        origin_or_destination TEXT,
+        hour INTEGER,
+        flights INTEGER,
+        delay_sum INTEGER,
+        PRIMARY KEY (flight_type, airline, origin_or_destination, hour)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER delay_stats_insert AFTER INSERT ON flights
+    WHEN NEW.actual_time IS NOT NULL AND NEW.scheduled_time IS NOT NULL
+    BEGIN
+        INSERT INTO delay_stats VALUES (
+            NEW.flight_type, COALESCE(NEW.airline, ''), COALESCE(NEW.origin_or_destination, ''), NEW.scheduled_time / 3600 % 24,
+            1, MIN(MAX(NEW.actual_time - NEW.scheduled_time, {min_delay}), {max_delay}))
+        ON CONFLICT DO UPDATE SET flights = flights + 1, delay_sum = delay_sum + excluded.delay_sum;
+    END;
+
+    CREATE TRIGGER delay_stats_delete AFTER DELETE ON flights
+    WHEN OLD.actual_time IS NOT NULL AND OLD.scheduled_time IS NOT NULL
+    BEGIN
+        UPDATE delay_stats SET flights = flights - 1,
+            delay_sum = delay_sum - MIN(MAX(OLD.actual_time - OLD.scheduled_time, {min_delay}), {max_delay})
+        WHERE flight_type IS OLD.flight_type AND airline = COALESCE(OLD.airline, '')
+          AND origin_or_destination = COALESCE(OLD.origin_or_destination, '') AND hour = OLD.scheduled_time / 3600 % 24;
+    END;
+
+    CREATE TRIGGER delay_stats_update AFTER UPDATE OF actual_time, scheduled_time ON flights
+    BEGIN
+        UPDATE delay_stats SET flights = flights - 1,
+            delay_sum = delay_sum - MIN(MAX(OLD.actual_time - OLD.scheduled_time, {min_delay}), {max_delay})
+        WHERE OLD.actual_time IS NOT NULL AND OLD.scheduled_time IS NOT NULL
+          AND flight_type IS OLD.flight_type AND airline = COALESCE(OLD.airline, '')
+          AND origin_or_destination = COALESCE(OLD.origin_or_destination, '') AND hour = OLD.scheduled_time / 3600 % 24;
+        INSERT INTO delay_stats
+        SELECT NEW.flight_type, COALESCE(NEW.airline, ''), COALESCE(NEW.origin_or_destination, ''), NEW.scheduled_time / 3600 % 24,
+               1, MIN(MAX(NEW.actual_time - NEW.scheduled_time, {min_delay}), {max_delay})
+        WHERE NEW.actual_time IS NOT NULL AND NEW.scheduled_time IS NOT NULL
+        ON CONFLICT DO UPDATE SET flights = flights + 1, delay_sum = delay_sum + excluded.delay_sum;
+    END;
+'''
+
+
+# Function to create delay_stats and its triggers, filling it from the flights already stored
+def create_delay_stats(conn):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='delay_stats'").fetchone():
+        return
+    conn.executescript(f'''
+        BEGIN;
+        {delay_stats_table}
+        INSERT INTO delay_stats
+        SELECT flight_type, COALESCE(airline, ''), COALESCE(origin_or_destination, ''), scheduled_time / 3600 % 24,
+               COUNT(*), SUM(MIN(MAX(actual_time - scheduled_time, {min_delay}), {max_delay}))
+        FROM flights WHERE actual_time IS NOT NULL AND scheduled_time IS NOT NULL
+        GROUP BY 1, 2, 3, 4;
+        COMMIT;
+    ''')
+
+
+# Function to add the group key columns (missing names as '', UTC hour of the scheduled time) to flights
+def with_group_keys(flights):
+    flights = flights.assign(airline=flights['airline'].fillna(''),
+                             origin_or_destination=flights['origin_or_destination'].fillna(''))
+    flights['hour'] = flights['scheduled_time'] // 3600 % 24
+    return flights
+
+
+# Function to compute the same per-group sums as delay_stats straight from flights, e.g. for a backtest
+def delay_stats_from_flights(flights):
+    flights = with_group_keys(flights.dropna(subset=['scheduled_time', 'actual_time']))
+    flights['delay_sum'] = (flights['actual_time'] - flights['scheduled_time']).clip(min_delay, max_delay)
+    flights['flights'] = 1
+    return flights.groupby(group_levels[-1], as_index=False)[['flights', 'delay_sum']].sum()
+
+
+# Function to build the model: the overall mean delay plus one table of shrunk mean delays per group level
+def build_model(stats):
+    total = stats['flights'].sum()
+    overall = stats['delay_sum'].sum() / total if total else 0.0
+    tables = []
+    parent = None
+    for level in group_levels:
+        table = stats.groupby(level, as_index=False)[['flights', 'delay_sum']].sum()
+        table = table[table['flights'] > 0]
+        if parent is None:
+            table['parent_mean'] = overall
+        else:
+            table = table.merge(parent[level[:-1] + ['mean']].rename(columns={'mean': 'parent_mean'}), on=level[:-1], how='left')
+        table['mean'] = (table['delay_sum'] + prior_weight * table['parent_mean']) / (table['flights'] + prior_weight)
+        tables.append(table[level + ['mean']])
+        parent = table
+    return overall, tables
+
+
+# Function to load the model from the delay_stats table
+def load_model(conn):
+    return build_model(pd.read_sql_query('SELECT * FROM delay_stats', conn))
+
+
+# Function to predict the delay (seconds) of every flight, using the most specific group that has history
+def predict_delays(model, flights):
+    overall, tables = model
+    flights = with_group_keys(flights)
+    prediction = np.full(len(flights), overall, dtype=float)
+    for level, table in zip(group_levels, tables):
+        means = flights[level].merge(table, on=level, how='left')['mean'].to_numpy()
+        prediction = np.where(np.isnan(means), prediction, means)
+    return prediction
+
+
+# Function to predict when flights will really move (epoch seconds): the API's estimate when it
+# has one, otherwise the scheduled time plus the predicted delay
+def predict_times(model, flights):
+    predicted = flights['scheduled_time'].to_numpy(dtype=float) + predict_delays(model, flights)
+    estimated = flights['estimated_time'].to_numpy(dtype=float)
+    return np.where(np.isnan(estimated), predicted, estimated).round().astype(np.int64)
+
+
+# Function to load the flights that haven't moved yet and may still move after now, with their predicted_time
+def load_future_flights(conn, now, model=None):
+    flights = pd.read_sql_query('''
+        SELECT flight_type, airline, origin_or_destination, callsign, scheduled_time, estimated_time, local_timezone,
+               registration, model_code, aircraft_model
+        FROM flights
+        WHERE scheduled_time > ? AND actual_time IS NULL
+    ''', conn, params=(now - lookback,))
+    flights['predicted_time'] = predict_times(model or load_model(conn), flights)
+    return flights[flights['predicted_time'] > now].sort_values('predicted_time', kind='stable').reset_index(drop=True)
+
+
+# Function to find the top-k non-overlapping windows over predicted times (epoch seconds).
+# Returns dicts with start, end (epoch seconds) and count, like best_windows_from_rollup.
+def best_windows_from_predictions(predicted_times, window_minutes, k=1):
+    starts, counts = np.unique(np.asarray(predicted_times, dtype=np.int64) // 60 * 60, return_counts=True)
+    if len(starts) == 0:
+        return []
+    windows = find_best_windows_from_counts(starts, counts, int(window_minutes * 60), k)
+    for window in windows:
+        window['start'] = int(window['start'])
+        window['end'] = int(window['end'])
+    return windows
+
+
+# Columns of the flights history the backtest needs
+history_columns = ['flight_type', 'airline', 'origin_or_destination', 'scheduled_time', 'estimated_time', 'actual_time']
+
+
+# Function to load the flights that have moved, oldest first, from the database or, when store is
+# given, from only the needed columns of the Parquet store (see flight_store.py)
+def load_history(conn, store=None):
+    if store is None:
+        return pd.read_sql_query(f'''
+            SELECT {', '.join(history_columns)}
+            FROM flights
+            WHERE scheduled_time IS NOT NULL AND actual_time IS NOT NULL
+            ORDER BY scheduled_time
+        ''', conn)
+    from flight_store import read_flights
+    flights = read_flights(store, history_columns).dropna(subset=['scheduled_time', 'actual_time'])
+    # Group keys are filled with '' and merged on, which categoricals don't allow
+    flights = flights.astype({'airline': object, 'origin_or_destination': object})
+    return flights.sort_values('scheduled_time', kind='stable').reset_index(drop=True)
+
+
+# Function to score the model on stored history: it's built from the flights scheduled before the
+# cutoff (by default the first train_fraction of them) and predicts the actual times after it.
+# Returns mean and median absolute errors in minutes, next to the scheduled-time baseline.
+def backtest(conn, cutoff=None, train_fraction=0.7, store=None):
+    flights = load_history(conn, store)
+    if cutoff is None:
+        cutoff = flights['scheduled_time'].iloc[int(len(flights) * train_fraction)] if len(flights) else 0
+    train = flights[flights['scheduled_time'] < cutoff]
+    test = flights[flights['scheduled_time'] >= cutoff]
+    if train.empty or test.empty:
+        raise ValueError("Not enough flights with an actual time on both sides of the cutoff")
+
+    model = build_model(delay_stats_from_flights(train))
+    actual = test['actual_time'].to_numpy(dtype=float)
+    errors = {
+        'scheduled_time': np.abs(test['scheduled_time'].to_numpy(dtype=float) - actual),
+        'delay model': np.abs(test['scheduled_time'].to_numpy(dtype=float) + predict_delays(model, test) - actual),
+    }
+    return pd.DataFrame({
+        'mean_abs_error_min': {name: error.mean() / 60 for name, error in errors.items()},
+        'median_abs_error_min': {name: np.median(error) / 60 for name, error in errors.items()},
+        'within_10_min': {name: (error <= 600).mean() for name, error in errors.items()},
+    }).assign(train_flights=len(train), test_flights=len(test))
+
+
+if __name__ == "__main__":
+    # Usage: python delay_model.py [DB_PATH [STORE_DIR]]; with a store the history is read from Parquet
+    if len(sys.argv) > 2:
+        print(backtest(None, store=sys.argv[2]).round(2).to_string())
+    else:
+        conn = connect(sys.argv[1] if len(sys.argv) > 1 else db_path, read_only=True, tables=('delay_stats',))
+        print(backtest(conn).round(2).to_string())
+        conn.close()
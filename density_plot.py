@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+# Headless flight density chart. Counts are pre-binned with numpy and drawn as one step patch
+# (instead of one bar patch per bucket) on a figure rendered by the Agg backend, without pyplot,
+# so nothing blocks and no display is needed. Only the tick labels are formatted, by matplotlib's
+# date formatter. Per-day tiles are cached and only re-rendered when that day's counts change;
+# matplotlib is only imported when a tile has to be drawn.
+db_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/vilnius_airport.db'
+tile_dir = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/plot_tiles'
+
+# Bucket size in seconds (10 minutes, like the bar chart)
+bucket_seconds = 600
+
+# Image format of the tiles ('png' or 'svg') and figure settings
+tile_format = 'png'
+figure_size = (14, 7)
+dpi = 100
+
+# Timezone of the chart's time axis (same as local_time.airport_timezone)
+airport_timezone = 'Europe/Vilnius'
+
+# Bumped when the drawing code changes, so cached tiles are re-rendered
+tile_version = 1
+
+
+# Function to spread (bucket start, count) pairs over every bucket from start to end, zeros included
+def dense_counts(starts, counts, start, end, bucket=bucket_seconds):
+    starts = np.asarray(starts, dtype=np.int64)
+    inside = (starts >= start) & (starts < end)
+    values = np.bincount((starts[inside] - start) // bucket, weights=np.asarray(counts)[inside],
+                         minlength=(end - start + bucket - 1) // bucket)
+    return np.arange(start, start + (len(values) + 1) * bucket, bucket), values
+
+
+# Function to draw the counts into a new Agg figure and write it to path (format from the extension).
+# highlight is an optional (start, end) in epoch seconds, e.g. the best time window.
+def render_density(starts, counts, path, highlight=None, start=None, end=None, bucket=bucket_seconds,
+                   timezone=airport_timezone, title='Number of Flights Over Time'):
+    import matplotlib.dates as mdates
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    starts = np.asarray(starts, dtype=np.int64)
+    if start is None:
+        start = int(starts.min()) // bucket * bucket if len(starts) else 0
+    if end is None:
+        end = int(starts.max()) + bucket if len(starts) else start + bucket
+    edges, values = dense_counts(starts, counts, start, end, bucket)
+
+    figure = Figure(figsize=figure_size, dpi=dpi)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    # Matplotlib dates are days since 1970-01-01 UTC, so epoch seconds only need dividing
+    ax.stairs(values, edges / 86400, fill=True, facecolor='skyblue', edgecolor='black', linewidth=0.5)
+    if highlight is not None:
+        ax.axvspan(highlight[0] / 86400, highlight[1] / 86400, color='orange', alpha=0.5, label='Best Time Window')
+        ax.legend()
+
+    zone = ZoneInfo(timezone)
+    locator = mdates.AutoDateLocator(tz=zone)
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator, tz=zone))
+    ax.set_xlim(edges[0] / 86400, edges[-1] / 86400)
+    ax.set_title(title)
+    ax.set_xlabel('Scheduled Time')
+    ax.set_ylabel('Number of Flights')
+    ax.grid(axis='y')
+    figure.tight_layout()
+    figure.savefig(path)
+    return path
+
+
+# Function to get the local days (date, midnight, next midnight as epoch seconds) from start to end
+def local_days(start, end, timezone=airport_timezone):
+    zone = ZoneInfo(timezone)
+    day = datetime.fromtimestamp(start, zone).date()
+    days = []
+    while True:
+        midnight = int(datetime(day.year, day.month, day.day, tzinfo=zone).timestamp())
+        if midnight >= end:
+            return days
+        following = day + timedelta(days=1)
+        days.append((day, midnight, int(datetime(following.year, following.month, following.day, tzinfo=zone).timestamp())))
+        day = following
+
+
+# Function to render one tile per local day into directory, skipping days whose tile is already
+# there for the same counts and highlight (tracked by a digest in tiles.json). Returns the paths
+# of all tiles and the number that had to be rendered.
+def render_day_tiles(starts, counts, directory=tile_dir, highlight=None, bucket=bucket_seconds, timezone=airport_timezone):
+    starts = np.asarray(starts, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    if len(starts) == 0:
+        return [], 0
+    os.makedirs(directory, exist_ok=True)
+    index_path = os.path.join(directory, 'tiles.json')
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+
+    paths = []
+    rendered = 0
+    for day, midnight, next_midnight in local_days(int(starts.min()), int(starts.max()) + 1, timezone):
+        first, last = np.searchsorted(starts, [midnight, next_midnight])
+        day_highlight = None
+        if highlight is not None and highlight[0] < next_midnight and highlight[1] > midnight:
+            day_highlight = (max(highlight[0], midnight), min(highlight[1], next_midnight))
+
+        digest = hashlib.sha1(starts[first:last].tobytes() + counts[first:last].tobytes()
+                              + repr((day_highlight, bucket, timezone, tile_version)).encode()).hexdigest()
+        path = os.path.join(directory, f"{day.isoformat()}.{tile_format}")
+        if index.get(day.isoformat()) != digest or not os.path.exists(path):
+            render_density(starts[first:last], counts[first:last], path, day_highlight, midnight, next_midnight,
+                           bucket, timezone, title=f"Number of Flights on {day.isoformat()}")
+            index[day.isoformat()] = digest
+            rendered += 1
+        paths.append(path)
+
+    with open(index_path, 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    return paths, rendered
+
+
+if __name__ == "__main__":
+    from flight_db import connect
+    from flight_rollup import load_bucket_counts
+
+    # Usage: python density_plot.py [DB_PATH [TILE_DIR]]
+    directory = sys.argv[2] if len(sys.argv) > 2 else tile_dir
+    conn = connect(sys.argv[1] if len(sys.argv) > 1 else db_path, read_only=True, tables=('flight_counts',))
+    bucket_starts, bucket_counts = load_bucket_counts(conn, bucket=bucket_seconds)
+    conn.close()
+    tiles, rendered = render_day_tiles(bucket_starts, bucket_counts, directory)
+    print(f"{len(tiles)} day tiles in {directory}, {rendered} rendered")
@@ -1,138 +1,93 @@
-import json
-import sqlite3
+import argparse
+import io
+import time
 import pandas as pd
 from datetime import datetime, timezone
 from tabulate import tabulate
-import time
+from aircraft_index import create_aircraft_table
+from airport_weather import create_weather_tables, save_plugin_data
+from delay_model import create_delay_stats
+from flight_db import connect
+from flight_extract import extract_flights
+from flight_rollup import create_rollup
+from flight_store import create_change_log, export_store
+from local_time import localize_columns
+from snapshot_archive import iter_snapshots
+from snapshot_reader import iter_array_items, iter_schedule_flights, plugin_data_path, read_object_fields, schedule_path, snapshot_errors
+from snapshot_state import create_snapshot_state_table, read_if_changed, save_snapshot_state, wait_for_change
 
 # File paths for JSON data
 arrivals_file_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/airport_arrivals.json'
 departures_file_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/airport_departures.json'
 
-# SQLite database connection
+# Snapshot archive written by read-api.py, used for backfills
+archive_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/snapshot_archive.ndjson.gz'
+flight_types = {'arrivals': 'arrival', 'departures': 'departure'}
+
+# Bulk ingest mode: one indexed lookup and one executemany upsert per file
+# instead of a SELECT and an UPDATE/INSERT for every flight
+bulk_ingest = True
+
+# Parquet copy of the flights history for the analysis scripts (see flight_store.py), refreshed
+# at most every store_export_interval seconds with only the days that changed. None disables it.
+store_dir = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/flights_parquet'
+store_export_interval = None
+
+# SQLite database connection (WAL, so the reporting scripts can read while flights are ingested).
+# Creates the flights table if it doesn't exist, migrating an older database, the per-minute
+# flight count rollup, the delay model's per-group sums, the aircraft table and the Parquet store's
+# change log; their triggers update them with every write to flights. The weather and runways tables are filled from the
+# pluginData blocks of the same snapshots.
 db_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/vilnius_airport.db'
-conn = sqlite3.connect(db_path)
+
+# Command line, parsed before connecting so --db can point at another database
+parser = argparse.ArgumentParser(description='Ingest Vilnius airport schedule snapshots into SQLite.')
+parser.add_argument('--db', default=db_path, help='path to vilnius_airport.db')
+parser.add_argument('--backfill', nargs='*', metavar='TIME',
+                    help='re-ingest archived snapshots from START to END (UTC, e.g. 2024-10-12 or 2024-10-12T06:00) and exit')
+args = parser.parse_args()
+
+conn = connect(args.db, setup=(create_rollup, create_delay_stats, create_aircraft_table, create_weather_tables, create_change_log))
 cursor = conn.cursor()
 
-# Create flights table if it doesn't exist
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS flights (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        flight_type TEXT,
-        scheduled_time TEXT,
-        scheduled_time_other TEXT,
-        estimated_time TEXT,
-        estimated_time_other TEXT,
-        actual_time TEXT,
-        actual_time_other TEXT,
-        status_live TEXT,
-        status_text TEXT,
-        status_icon TEXT,
-        airline TEXT,
-        aircraft_model TEXT,
-        registration TEXT,
-        callsign TEXT,
-        model_code TEXT,
-        country TEXT,
-        restricted TEXT,
-        owner_name TEXT,
-        origin_or_destination TEXT,
-        last_update_time TEXT,
-        data_input_time TEXT
-    )
-''')
-
-# Function to extract flight data
-def extract_flight_info(flight_type, flight):
-    try:
-        airline = flight.get('flight', {}).get('airline', {}).get('name', '')
-    except:
-        airline = ''
-    aircraft = flight['flight']['aircraft']
-    owner = flight['flight']
-    
-    aircraft_model = aircraft['model']['text']
-    model_code = aircraft['model']['code']
-    registration = aircraft['registration']
-    callsign = flight['flight']['identification']['callsign']
-    try:
-        country = aircraft['country']['name']
-    except:
-        country = ''
-    try:
-        restricted = str(aircraft['restricted'])
-    except:
-        restricted = ''
-    try:
-        owner_name = owner['owner']['name']
-    except:
-        owner_name = ''
-    
-    if flight_type == 'arrival':
-        origin_or_destination = flight['flight']['airport']['origin']['name']
-        scheduled_time = flight['flight']['time']['scheduled']['arrival']
-        scheduled_time_other = flight['flight']['time']['scheduled']['departure']
-        estimated_time = flight['flight']['time'].get('estimated', {}).get('arrival')
-        estimated_time_other = flight['flight']['time'].get('estimated', {}).get('departure')
-        actual_time = flight['flight']['time']['real'].get('arrival')
-        actual_time_other = flight['flight']['time']['real'].get('departure')
-    else:
-        origin_or_destination = flight['flight']['airport']['destination']['name']
-        scheduled_time = flight['flight']['time']['scheduled']['departure']
-        scheduled_time_other = flight['flight']['time']['scheduled']['arrival']
-        estimated_time = flight['flight']['time'].get('estimated', {}).get('departure')
-        estimated_time_other = flight['flight']['time'].get('estimated', {}).get('arrival')
-        actual_time = flight['flight']['time']['real'].get('departure')
-        actual_time_other = flight['flight']['time']['real'].get('arrival')
-
-    def format_time(timestamp):
-        return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None
-
-    return {
-        'airline': airline,
-        'aircraft_model': aircraft_model,
-        'model_code': model_code,
-        'registration': registration,
-        'callsign': callsign,
-        'country': country,
-        'restricted': restricted,
-        'owner_name': owner_name,
-        'origin_or_destination': origin_or_destination,
-        'scheduled_time': format_time(scheduled_time),
-        'scheduled_time_other': format_time(scheduled_time_other),
-        'estimated_time': format_time(estimated_time),
-        'estimated_time_other': format_time(estimated_time_other),
-        'actual_time': format_time(actual_time),
-        'actual_time_other': format_time(actual_time_other),
-        'status_live': str(flight['flight']['status']['live']),
-        'status_text': flight['flight']['status']['text'],
-        'status_icon': flight['flight']['status']['icon'],
-        'last_update_time': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
-    }
+# Create the table that tracks which snapshot files were already ingested
+create_snapshot_state_table(cursor)
+
+# Columns whose change makes a stored flight worth updating. The estimates are included so every
+# revised estimate reaches the flight_events history, and the aircraft so a registration assigned
+# late reaches the aircraft table; other fields only follow along with these.
+tracked_columns = ['actual_time', 'status_live', 'status_text', 'status_icon', 'estimated_time', 'estimated_time_other',
+                   'registration', 'aircraft_model', 'aircraft_hex']
+
+# Function to extract flight data; update_time defaults to now and is the snapshot time when backfilling
+def extract_flight_info(flight_type, flight, update_time=None):
+    return extract_flights(flight_type, [flight], update_time)[0]._asdict()
 
 # Function to check and update flight in the database
 def check_and_update_flight(flight_type, flight):
     flight_info = extract_flight_info(flight_type, flight)
+    # Without a scheduled time a flight has no natural key, so it's skipped
+    if flight_info['scheduled_time'] is None:
+        return 'skipped', None
 
-    cursor.execute('''SELECT actual_time, status_live, status_text, status_icon 
-                      FROM flights WHERE airline=? AND origin_or_destination=? AND scheduled_time=? AND flight_type=?''',
+    cursor.execute(f'''SELECT {', '.join(tracked_columns)}
+                       FROM flights WHERE airline=? AND origin_or_destination=? AND scheduled_time=? AND flight_type=?''',
                    (flight_info['airline'], flight_info['origin_or_destination'], flight_info['scheduled_time'], flight_type))
     existing_flight = cursor.fetchone()
 
     if existing_flight:
-        if (existing_flight[0] != flight_info['actual_time'] or 
-            existing_flight[1] != flight_info['status_live'] or 
-            existing_flight[2] != flight_info['status_text'] or 
-            existing_flight[3] != flight_info['status_icon']):
+        if existing_flight != tuple(flight_info[column] for column in tracked_columns):
             cursor.execute('''UPDATE flights
                               SET estimated_time=?, actual_time=?, status_live=?, status_text=?, status_icon=?, last_update_time=?,
-                                  scheduled_time_other=?, estimated_time_other=?, actual_time_other=?, callsign=?, model_code=?, country=?, restricted=?, owner_name=?
+                                  scheduled_time_other=?, estimated_time_other=?, actual_time_other=?, callsign=?, model_code=?, country=?, restricted=?, owner_name=?,
+                                  registration=?, aircraft_model=?, aircraft_hex=?
                               WHERE airline=? AND origin_or_destination=? AND scheduled_time=? AND flight_type=?''',
                            (flight_info['estimated_time'], flight_info['actual_time'], flight_info['status_live'], 
                             flight_info['status_text'], flight_info['status_icon'], flight_info['last_update_time'],
                             flight_info['scheduled_time_other'], flight_info['estimated_time_other'], flight_info['actual_time_other'],
                             flight_info['callsign'], flight_info['model_code'], flight_info['country'], flight_info['restricted'], 
-                            flight_info['owner_name'], flight_info['airline'], flight_info['origin_or_destination'], 
+                            flight_info['owner_name'], flight_info['registration'], flight_info['aircraft_model'], flight_info['aircraft_hex'],
+                            flight_info['airline'], flight_info['origin_or_destination'], 
                             flight_info['scheduled_time'], flight_type))
             return 'updated', flight_info
         else:
@@ -141,43 +96,117 @@ def check_and_update_flight(flight_type, flight):
         cursor.execute('''INSERT INTO flights 
                           (flight_type, airline, aircraft_model, registration, callsign, model_code, country, restricted, owner_name,
                            origin_or_destination, scheduled_time, scheduled_time_other, estimated_time, estimated_time_other, 
-                           actual_time, actual_time_other, status_live, status_text, status_icon, last_update_time, data_input_time)
-                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                           actual_time, actual_time_other, status_live, status_text, status_icon, local_timezone, aircraft_hex,
+                           last_update_time, data_input_time)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                        (flight_type, flight_info['airline'], flight_info['aircraft_model'], flight_info['registration'], 
                         flight_info['callsign'], flight_info['model_code'], flight_info['country'], flight_info['restricted'], 
                         flight_info['owner_name'], flight_info['origin_or_destination'], flight_info['scheduled_time'], 
                         flight_info['scheduled_time_other'], flight_info['estimated_time'], flight_info['estimated_time_other'], 
                         flight_info['actual_time'], flight_info['actual_time_other'], flight_info['status_live'], 
-                        flight_info['status_text'], flight_info['status_icon'], flight_info['last_update_time'], 
-                        flight_info['last_update_time']))
+                        flight_info['status_text'], flight_info['status_icon'], flight_info['local_timezone'],
+                        flight_info['aircraft_hex'], flight_info['last_update_time'], flight_info['last_update_time']))
         return 'added', flight_info
 
+# Upsert statement for the bulk ingest mode; the WHERE clause skips rows whose
+# tracked fields did not change so unchanged flights cost no write, and never lets
+# an older snapshot (when backfilling) overwrite newer data
+upsert_flight_query = f'''
+    INSERT INTO flights
+    (flight_type, airline, aircraft_model, registration, callsign, model_code, country, restricted, owner_name,
+     origin_or_destination, scheduled_time, scheduled_time_other, estimated_time, estimated_time_other,
+     actual_time, actual_time_other, status_live, status_text, status_icon, local_timezone, aircraft_hex, last_update_time,
+     data_input_time)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (flight_type, scheduled_time, airline, origin_or_destination) DO UPDATE
+    SET estimated_time=excluded.estimated_time, actual_time=excluded.actual_time, status_live=excluded.status_live,
+        status_text=excluded.status_text, status_icon=excluded.status_icon, last_update_time=excluded.last_update_time,
+        scheduled_time_other=excluded.scheduled_time_other, estimated_time_other=excluded.estimated_time_other,
+        actual_time_other=excluded.actual_time_other, callsign=excluded.callsign, model_code=excluded.model_code,
+        country=excluded.country, restricted=excluded.restricted, owner_name=excluded.owner_name,
+        local_timezone=excluded.local_timezone, registration=excluded.registration,
+        aircraft_model=excluded.aircraft_model, aircraft_hex=excluded.aircraft_hex
+    WHERE ({' OR '.join(f'{column} IS NOT excluded.{column}' for column in tracked_columns)})
+      AND (last_update_time IS NULL OR last_update_time <= excluded.last_update_time)
+'''
+
+# Function to add or update a whole batch of flights with one lookup and one executemany
+def upsert_flights(flight_type, flights, update_time=None):
+    # Without a scheduled time a flight has no natural key (NULLs never conflict), so it's skipped
+    records = [record for record in extract_flights(flight_type, flights, update_time) if record.scheduled_time is not None]
+    scheduled_times = [record.scheduled_time for record in records]
+
+    # Load the tracked fields of every stored flight in the batch's time range (uses the natural-key index)
+    existing_flights = {}
+    if scheduled_times:
+        cursor.execute(f'''SELECT airline, origin_or_destination, scheduled_time, {', '.join(tracked_columns)}, last_update_time
+                           FROM flights WHERE flight_type=? AND scheduled_time BETWEEN ? AND ?''',
+                       (flight_type, min(scheduled_times), max(scheduled_times)))
+        existing_flights = {row[:3]: (row[3:-1], row[-1]) for row in cursor.fetchall()}
+
+    added_flights = []
+    updated_flights = []
+    rows = []
+    for record in records:
+        key = (record.airline, record.origin_or_destination, record.scheduled_time)
+        tracked = tuple(getattr(record, column) for column in tracked_columns)
+        if key not in existing_flights:
+            added_flights.append(record)
+        elif existing_flights[key][0] != tracked and (existing_flights[key][1] or 0) <= record.last_update_time:
+            updated_flights.append(record)
+        else:
+            continue
+        existing_flights[key] = (tracked, record.last_update_time)
+        # The record is already in column order; data_input_time starts equal to last_update_time
+        rows.append(record + (record.last_update_time,))
+
+    cursor.executemany(upsert_flight_query, rows)
+    return added_flights, updated_flights
+
+# Function to store one file's flights, collecting the added and updated ones
+def ingest_flights(flight_type, flights, added_flights, updated_flights):
+    if bulk_ingest:
+        added, updated = upsert_flights(flight_type, flights)
+        added_flights.extend(added)
+        updated_flights.extend(updated)
+        return
+
+    for flight in flights:
+        result, flight_info = check_and_update_flight(flight_type, flight)
+        if result == 'added':
+            added_flights.append(flight_info)
+        elif result == 'updated':
+            updated_flights.append(flight_info)
+
 # Function to load and process flights from JSON files
 def process_flights():
     added_flights = []
     updated_flights = []
 
-    with open(arrivals_file_path, 'r', encoding='utf-8') as arrivals_file:
-        arrivals_data = json.load(arrivals_file)['result']['response']['airport']['pluginData']['schedule']['arrivals']['data']
-        for flight in arrivals_data:
-            result, flight_info = check_and_update_flight('arrival', flight)
-            if result == 'added':
-                added_flights.append(flight_info)
-            elif result == 'updated':
-                updated_flights.append(flight_info)
-
-    with open(departures_file_path, 'r', encoding='utf-8') as departures_file:
-        departures_data = json.load(departures_file)['result']['response']['airport']['pluginData']['schedule']['departures']['data']
-        for flight in departures_data:
-            result, flight_info = check_and_update_flight('departure', flight)
-            if result == 'added':
-                added_flights.append(flight_info)
-            elif result == 'updated':
-                updated_flights.append(flight_info)
+    for flight_type, mode, file_path in [('arrival', 'arrivals', arrivals_file_path),
+                                         ('departure', 'departures', departures_file_path)]:
+        # Skip the parse and the database work when the file didn't change since the last run
+        content, state = read_if_changed(cursor, file_path)
+        if content is None:
+            continue
+        try:
+            # Stream the flights out of the schedule instead of building the whole document
+            flights_data = iter_schedule_flights(io.BytesIO(content), mode)
+            ingest_flights(flight_type, flights_data, added_flights, updated_flights)
+
+            # Weather and runways are decoded from the same bytes, skipping the schedule
+            save_plugin_data(conn, read_object_fields(io.BytesIO(content), plugin_data_path, {'weather', 'runways'}))
+        except snapshot_errors as e:
+            # The file is probably still being written; it will be read again on the next run
+            print(f"Could not parse {file_path}: {e}")
+            continue
+        save_snapshot_state(cursor, state)
 
     conn.commit()
+    print_changed_flights(added_flights, updated_flights)
 
-    # Print updated and added flights in a table
+# Function to print updated and added flights in a table
+def print_changed_flights(added_flights, updated_flights):
     if added_flights or updated_flights:
         changed_flights = pd.DataFrame(added_flights + updated_flights)
 
@@ -187,6 +216,9 @@ def process_flights():
             columns_to_display = ['flight_type', 'callsign', 'origin_or_destination', 'scheduled_time', 'estimated_time']
             columns_to_display = [col for col in columns_to_display if col in available_columns]
 
+            # Times are stored as UTC epoch seconds; show them in the airport's local time
+            localize_columns(changed_flights, ['scheduled_time', 'estimated_time'], naive=True)
+
             table = tabulate(changed_flights[columns_to_display],
                              headers='keys', tablefmt='grid', showindex=False)
             print(f"\nFlights added: {len(added_flights)}, Flights updated: {len(updated_flights)}")
@@ -194,10 +226,39 @@ def process_flights():
         else:
             print("No flights were added or updated.")
 
-# Main loop: process flights every 30 seconds
-while True:
-    process_flights()
-    time.sleep(30)
+# Function to re-ingest the archived snapshots taken between start and end (epoch seconds), oldest first.
+# Each flight is stamped with its snapshot time, so replaying old snapshots never overwrites newer data.
+def backfill_from_archive(start=None, end=None):
+    added_count = 0
+    updated_count = 0
+    for timestamp, mode, record in iter_snapshots(archive_path, start, end):
+        flights_data = iter_array_items(io.BytesIO(record), ('data',) + schedule_path + (mode, 'data'))
+        added, updated = upsert_flights(flight_types[mode], flights_data, timestamp)
+        save_plugin_data(conn, read_object_fields(io.BytesIO(record), ('data',) + plugin_data_path, {'weather', 'runways'}))
+        conn.commit()
+        added_count += len(added)
+        updated_count += len(updated)
+        snapshot_time = datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{snapshot_time} {mode}: {len(added)} added, {len(updated)} updated")
+    print(f"\nBackfill done. Flights added: {added_count}, Flights updated: {updated_count}")
+
+# Function to turn a UTC date or time given on the command line into epoch seconds
+def parse_utc_time(value):
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+# Main loop: process flights whenever a snapshot file changes, checking at least every 30 seconds.
+# Started with --backfill [START [END]] it re-ingests the snapshot archive instead and exits.
+if args.backfill is not None:
+    backfill_from_archive(*(parse_utc_time(value) for value in args.backfill[:2]))
+else:
+    last_export = 0
+    while True:
+        process_flights()
+        if store_export_interval is not None and time.time() - last_export >= store_export_interval:
+            days, events = export_store(conn, store_dir)
+            print(f"Exported {days} changed days and {events} new events to {store_dir}")
+            last_export = time.time()
+        wait_for_change([arrivals_file_path, departures_file_path], 30)
 
-# Close the database connection (unreachable in this infinite loop)
+# Close the database connection
 conn.close()
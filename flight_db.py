@@ -0,0 +1,211 @@
+import os
+import sqlite3
+from urllib.request import pathname2url
+
+# Schema of vilnius_airport.db, its migrations and the connection settings shared by all scripts.
+# The schema version is kept in PRAGMA user_version:
+#   0 - original table with times stored as '%Y-%m-%d %H:%M:%S' UTC text
+#   1 - times stored as INTEGER epoch seconds (UTC), plus time indexes
+#   2 - local_timezone column with the airport's IANA timezone name from the payload
+#   3 - flight_events history of time and status revisions, written by a trigger
+#   4 - aircraft_hex column with the aircraft's ICAO 24-bit address from the payload
+#   5 - missing airline and origin_or_destination stored as '' (NULLs never conflict in the
+#       natural-key index, so such flights were inserted again on every poll)
+schema_version = 5
+
+# Connection settings. In WAL mode readers never block the ingester and the ingester never
+# blocks readers; synchronous=NORMAL only syncs at checkpoints, which is safe in WAL mode.
+busy_timeout = 10  # Seconds to wait for a lock instead of failing with "database is locked"
+mmap_size = 256 * 1024 * 1024  # Read pages through a memory map instead of read() calls
+statement_cache_size = 256  # Prepared statements kept per connection
+
+# Columns holding a time, stored as epoch seconds
+time_columns = ['scheduled_time', 'scheduled_time_other', 'estimated_time', 'estimated_time_other',
+                'actual_time', 'actual_time_other', 'last_update_time', 'data_input_time']
+
+flights_table = '''
+    CREATE TABLE IF NOT EXISTS flights (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        flight_type TEXT,
+        scheduled_time INTEGER,
+        scheduled_time_other INTEGER,
+        estimated_time INTEGER,
+        estimated_time_other INTEGER,
+        actual_time INTEGER,
+        actual_time_other INTEGER,
+        status_live TEXT,
+        status_text TEXT,
+        status_icon TEXT,
+        airline TEXT,
+        aircraft_model TEXT,
+        registration TEXT,
+        callsign TEXT,
+        model_code TEXT,
+        country TEXT,
+        restricted TEXT,
+        owner_name TEXT,
+        origin_or_destination TEXT,
+        last_update_time INTEGER,
+        data_input_time INTEGER,
+        local_timezone TEXT,
+        aircraft_hex TEXT
+    )
+'''
+
+# Columns whose revisions are recorded in flight_events
+event_columns = ['estimated_time', 'estimated_time_other', 'actual_time', 'actual_time_other',
+                 'status_live', 'status_text', 'status_icon']
+
+# Append-only history of flights: one row per changed column per update, observed at the
+# update's last_update_time. The trigger runs inside the writer's transaction and only fires
+# on real updates (the upsert skips unchanged flights), so unchanged polls write nothing.
+# old_value/new_value have no type, so times stay integers and statuses stay text.
+flight_events_table = f'''
+    CREATE TABLE IF NOT EXISTS flight_events (
+        id INTEGER PRIMARY KEY,
+        flight_id INTEGER,
+        observed_time INTEGER,
+        column_name TEXT,
+        old_value,
+        new_value
+    );
+    CREATE INDEX IF NOT EXISTS idx_flight_events_flight ON flight_events (flight_id, observed_time);
+    CREATE INDEX IF NOT EXISTS idx_flight_events_column ON flight_events (column_name, observed_time);
+
+    CREATE TRIGGER IF NOT EXISTS flight_events_update AFTER UPDATE OF {', '.join(event_columns)} ON flights
+    BEGIN
+        INSERT INTO flight_events (flight_id, observed_time, column_name, old_value, new_value)
+        SELECT NEW.id, NEW.last_update_time, column_name, old_value, new_value FROM (
+            {' UNION ALL '.join(f"SELECT '{column}' AS column_name, OLD.{column} AS old_value, NEW.{column} AS new_value"
+                                for column in event_columns)}
+        )
+        WHERE old_value IS NOT new_value;
+    END;
+'''
+
+# Columns of the version 0 table, copied by migrate_text_times
+flight_columns = ['id', 'flight_type', 'scheduled_time', 'scheduled_time_other', 'estimated_time',
+                  'estimated_time_other', 'actual_time', 'actual_time_other', 'status_live', 'status_text',
+                  'status_icon', 'airline', 'aircraft_model', 'registration', 'callsign', 'model_code', 'country',
+                  'restricted', 'owner_name', 'origin_or_destination', 'last_update_time', 'data_input_time']
+
+
+# Function to create the flights table and its indexes, migrating an older database first.
+# The natural-key index (flight_type, scheduled_time, ...) also serves every
+# "flight_type = ? AND scheduled_time > ?" query through its leading columns.
+def create_schema(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    table_exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='flights'").fetchone()
+    # A current database needs no writes, so opening one never takes a write lock
+    if table_exists and version == schema_version:
+        return
+    if table_exists and version < 1:
+        migrate_text_times(conn)
+    if table_exists and version < 2:
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(flights)')]
+        if 'local_timezone' not in columns:
+            conn.execute('ALTER TABLE flights ADD COLUMN local_timezone TEXT')
+    if table_exists and version < 4:
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(flights)')]
+        if 'aircraft_hex' not in columns:
+            conn.execute('ALTER TABLE flights ADD COLUMN aircraft_hex TEXT')
+    if table_exists and version < 5:
+        # The index is rebuilt below, once the duplicates the NULL keys let in are removed
+        conn.execute('DROP INDEX IF EXISTS idx_flights_natural_key')
+        conn.execute("UPDATE flights SET airline = '' WHERE airline IS NULL")
+        conn.execute("UPDATE flights SET origin_or_destination = '' WHERE origin_or_destination IS NULL")
+
+    conn.execute(flights_table)
+
+    # Remove any duplicate rows left behind by older versions before building the UNIQUE index
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_flights_natural_key'").fetchone() is None:
+        remove_duplicate_flights(conn)
+        conn.execute('''
+            CREATE UNIQUE INDEX idx_flights_natural_key
+            ON flights (flight_type, scheduled_time, airline, origin_or_destination)
+        ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_flights_scheduled_time ON flights (scheduled_time)')
+    conn.executescript(flight_events_table)
+    conn.execute(f'PRAGMA user_version = {schema_version}')
+    conn.commit()
+
+
+# Function to delete duplicate flights (same natural key), keeping the most recently updated row of
+# each, which holds the latest status and actual_time. Prints and returns how many were removed.
+def remove_duplicate_flights(conn):
+    removed = conn.execute('''
+        DELETE FROM flights WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY flight_type, scheduled_time, airline, origin_or_destination
+                    ORDER BY last_update_time DESC, id DESC
+                ) AS position
+                FROM flights
+            )
+            WHERE position = 1
+        )
+    ''').rowcount
+    if removed:
+        print(f"Removed {removed} duplicate flights, keeping the most recently updated row of each")
+    return removed
+
+
+# Function to open the flights database with the shared settings. A writer (the ingester) switches
+# the database to WAL and creates or migrates the schema, then runs any setup functions (e.g.
+# create_rollup). A reader (read_only=True) only ever opens a read-only connection, so it can't take
+# the write lock and works on a database it may only read; it checks that the schema is current and
+# that the derived tables it needs (e.g. 'flight_counts') exist, and fails if they don't.
+# Extra keyword arguments go to sqlite3.connect.
+def connect(db_path, read_only=False, setup=(), tables=(), **kwargs):
+    if read_only:
+        if not os.path.exists(db_path):
+            raise sqlite3.OperationalError(f"{db_path} doesn't exist yet; run the ingester "
+                                           "(find-daparture-and-arrival-in-VNO.py) to create it")
+        uri = 'file:' + pathname2url(os.path.abspath(db_path)) + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, timeout=busy_timeout, cached_statements=statement_cache_size, **kwargs)
+        check_schema(conn, db_path, tables)
+    else:
+        conn = sqlite3.connect(db_path, timeout=busy_timeout, cached_statements=statement_cache_size, **kwargs)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        create_schema(conn)
+        for function in setup:
+            function(conn)
+    conn.execute(f'PRAGMA mmap_size = {mmap_size}')
+    return conn
+
+
+# Function to check on a read-only connection that the schema is current and the given tables exist,
+# closing it with an error telling to run the ingester (which migrates and sets up) if not
+def check_schema(conn, db_path, tables=()):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    existing = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    missing = [table for table in ('flights',) + tuple(tables) if table not in existing]
+    if version < schema_version or missing:
+        conn.close()
+        problem = f"schema version {version}, expected {schema_version}" if version < schema_version else \
+            f"missing tables: {', '.join(missing)}"
+        raise sqlite3.OperationalError(f"{db_path} is out of date ({problem}); run the ingester "
+                                       "(find-daparture-and-arrival-in-VNO.py) to migrate it")
+
+
+# Function to rewrite a version 0 table with its text times converted to epoch seconds, in one transaction
+def migrate_text_times(conn):
+    converted = [f"CAST(strftime('%s', {column}) AS INTEGER)" if column in time_columns else column
+                 for column in flight_columns]
+    conn.commit()
+    try:
+        conn.execute('BEGIN')
+        conn.execute('DROP INDEX IF EXISTS idx_flights_natural_key')
+        conn.execute('ALTER TABLE flights RENAME TO flights_text_times')
+        conn.execute(flights_table)
+        conn.execute(f'''
+            INSERT INTO flights ({', '.join(flight_columns)})
+            SELECT {', '.join(converted)} FROM flights_text_times
+        ''')
+        conn.execute('DROP TABLE flights_text_times')
+        conn.execute('PRAGMA user_version = 1')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
@@ -0,0 +1,77 @@
+import time
+from collections import namedtuple
+
+# Columns of one extracted flight, in the order used for the flights table.
+# A namedtuple is a slotted tuple: it can go straight into executemany and still
+# be read by attribute (record.callsign) or turned into a DataFrame.
+FlightRecord = namedtuple('FlightRecord', [
+    'flight_type', 'airline', 'aircraft_model', 'registration', 'callsign', 'model_code', 'country', 'restricted',
+    'owner_name', 'origin_or_destination', 'scheduled_time', 'scheduled_time_other', 'estimated_time',
+    'estimated_time_other', 'actual_time', 'actual_time_other', 'status_live', 'status_text', 'status_icon',
+    'local_timezone', 'aircraft_hex', 'last_update_time',
+])
+
+
+# Function to list (column, path inside flight['flight'], default, kind) for every extracted field.
+# kind is None for plain values, 'str' for values stored as text and 'key' for the natural-key
+# columns, which get their default instead of None (NULLs never conflict in the UNIQUE index).
+# scheduled_time, the rest of the key, has no sensible default; flights without it aren't stored.
+def field_specs(flight_type):
+    here, other = ('arrival', 'departure') if flight_type == 'arrival' else ('departure', 'arrival')
+    endpoint, home = ('origin', 'destination') if flight_type == 'arrival' else ('destination', 'origin')
+    return [
+        ('airline', ('airline', 'name'), '', 'key'),
+        ('aircraft_model', ('aircraft', 'model', 'text'), None, None),
+        ('registration', ('aircraft', 'registration'), None, None),
+        ('callsign', ('identification', 'callsign'), None, None),
+        ('model_code', ('aircraft', 'model', 'code'), None, None),
+        ('country', ('aircraft', 'country', 'name'), '', None),
+        ('restricted', ('aircraft', 'restricted'), '', 'str'),
+        ('owner_name', ('owner', 'name'), '', None),
+        ('origin_or_destination', ('airport', endpoint, 'name'), '', 'key'),
+        ('scheduled_time', ('time', 'scheduled', here), None, None),
+        ('scheduled_time_other', ('time', 'scheduled', other), None, None),
+        ('estimated_time', ('time', 'estimated', here), None, None),
+        ('estimated_time_other', ('time', 'estimated', other), None, None),
+        ('actual_time', ('time', 'real', here), None, None),
+        ('actual_time_other', ('time', 'real', other), None, None),
+        ('status_live', ('status', 'live'), None, 'str'),
+        ('status_text', ('status', 'text'), None, None),
+        ('status_icon', ('status', 'icon'), None, None),
+        ('local_timezone', ('airport', home, 'timezone', 'name'), None, None),
+        ('aircraft_hex', ('aircraft', 'hex'), None, None),
+    ]
+
+
+# Function to compile field specs into one straight-line function returning a flat tuple.
+# Each field is a single chain of subscripts in a try block, which costs nothing unless a
+# key is missing, instead of a walk through nested .get() calls per field.
+def compile_extractor(specs):
+    lines = ['def extract(flight):', "    flight = flight['flight']"]
+    for i, (column, path, default, kind) in enumerate(specs):
+        access = 'flight' + ''.join(f'[{key!r}]' for key in path)
+        if kind == 'str':
+            access = f'str({access})'
+        lines += [
+            '    try:',
+            f'        v{i} = {access}',
+            '    except (KeyError, TypeError, IndexError):',
+            f'        v{i} = {default!r}',
+        ]
+        if kind == 'key':
+            lines += [f'    if v{i} is None:', f'        v{i} = {default!r}']
+    lines.append('    return (' + ''.join(f'v{i}, ' for i in range(len(specs))) + ')')
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['extract']
+
+
+_extractors = {flight_type: compile_extractor(field_specs(flight_type)) for flight_type in ('arrival', 'departure')}
+
+
+# Function to extract a batch of flights into FlightRecords. Times stay epoch seconds, the way
+# the flights table stores them, and all records share one last_update_time.
+def extract_flights(flight_type, flights, update_time=None):
+    extract = _extractors[flight_type]
+    update_time = update_time or int(time.time())
+    return [FlightRecord(flight_type, *extract(flight), update_time) for flight in flights]
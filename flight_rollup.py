@@ -0,0 +1,103 @@
+import numpy as np
+from best_window import find_best_windows_from_counts
+
+# Size of a rollup bucket in seconds (one minute); changing it rebuilds the rollup
+bucket_seconds = 60
+
+
+# Function to create the per-bucket flight count rollup and the triggers that keep it in step
+# with the flights table. The triggers run inside the writer's own transaction, so every ingest
+# path (per-flight, bulk upsert, backfill) updates the counts as flights are added, moved or removed.
+def create_rollup(conn, bucket=bucket_seconds):
+    conn.execute('CREATE TABLE IF NOT EXISTS rollup_settings (name TEXT PRIMARY KEY, value INTEGER)')
+    stored = conn.execute("SELECT value FROM rollup_settings WHERE name='bucket_seconds'").fetchone()
+    if stored and stored[0] == bucket:
+        return
+
+    conn.executescript(f'''
+        BEGIN;
+        DROP TRIGGER IF EXISTS flight_counts_insert;
+        DROP TRIGGER IF EXISTS flight_counts_delete;
+        DROP TRIGGER IF EXISTS flight_counts_update;
+        DROP TABLE IF EXISTS flight_counts;
+
+        CREATE TABLE flight_counts (
+            flight_type TEXT,
+            bucket_start INTEGER,
+            flights INTEGER,
+            PRIMARY KEY (flight_type, bucket_start)
+        ) WITHOUT ROWID;
+        CREATE INDEX idx_flight_counts_bucket_start ON flight_counts (bucket_start);
+
+        CREATE TRIGGER flight_counts_insert AFTER INSERT ON flights
+        WHEN NEW.scheduled_time IS NOT NULL
+        BEGIN
+            INSERT INTO flight_counts (flight_type, bucket_start, flights)
+            VALUES (NEW.flight_type, NEW.scheduled_time - NEW.scheduled_time % {bucket}, 1)
+            ON CONFLICT (flight_type, bucket_start) DO UPDATE SET flights = flights + 1;
+        END;
+
+        CREATE TRIGGER flight_counts_delete AFTER DELETE ON flights
+        WHEN OLD.scheduled_time IS NOT NULL
+        BEGIN
+            UPDATE flight_counts SET flights = flights - 1
+            WHERE flight_type IS OLD.flight_type AND bucket_start = OLD.scheduled_time - OLD.scheduled_time % {bucket};
+        END;
+
+        CREATE TRIGGER flight_counts_update AFTER UPDATE OF flight_type, scheduled_time ON flights
+        BEGIN
+            UPDATE flight_counts SET flights = flights - 1
+            WHERE OLD.scheduled_time IS NOT NULL
+              AND flight_type IS OLD.flight_type AND bucket_start = OLD.scheduled_time - OLD.scheduled_time % {bucket};
+            INSERT INTO flight_counts (flight_type, bucket_start, flights)
+            SELECT NEW.flight_type, NEW.scheduled_time - NEW.scheduled_time % {bucket}, 1
+            WHERE NEW.scheduled_time IS NOT NULL
+            ON CONFLICT (flight_type, bucket_start) DO UPDATE SET flights = flights + 1;
+        END;
+
+        INSERT INTO flight_counts (flight_type, bucket_start, flights)
+        SELECT flight_type, scheduled_time - scheduled_time % {bucket}, COUNT(*)
+        FROM flights WHERE scheduled_time IS NOT NULL
+        GROUP BY 1, 2;
+
+        INSERT OR REPLACE INTO rollup_settings (name, value) VALUES ('bucket_seconds', {bucket});
+        COMMIT;
+    ''')
+
+
+# Function to load the rollup between start and end (epoch seconds) as (bucket starts, counts),
+# summed over both flight types unless one is given, optionally re-bucketed to a coarser size
+def load_bucket_counts(conn, start=None, end=None, flight_type=None, bucket=None):
+    bucket_expression = f'bucket_start - bucket_start % {int(bucket)}' if bucket else 'bucket_start'
+    conditions = ['flights > 0']
+    params = []
+    if start is not None:
+        conditions.append('bucket_start >= ?')
+        params.append(start)
+    if end is not None:
+        conditions.append('bucket_start < ?')
+        params.append(end)
+    if flight_type is not None:
+        conditions.append('flight_type = ?')
+        params.append(flight_type)
+    rows = conn.execute(f'''
+        SELECT {bucket_expression}, SUM(flights) FROM flight_counts
+        WHERE {' AND '.join(conditions)}
+        GROUP BY 1 ORDER BY 1
+    ''', params).fetchall()
+    starts = np.array([row[0] for row in rows], dtype=np.int64)
+    counts = np.array([row[1] for row in rows], dtype=np.int64)
+    return starts, counts
+
+
+# Function to find the top-k non-overlapping windows of any length straight from the rollup.
+# Returned starts and ends are epoch seconds.
+def best_windows_from_rollup(conn, window_minutes, start=None, end=None, flight_type=None, k=1):
+    starts, counts = load_bucket_counts(conn, start, end, flight_type)
+    if len(starts) == 0:
+        return []
+    windows = find_best_windows_from_counts(starts, counts, int(window_minutes * 60), k)
+    for window in windows:
+        window['start'] = int(window['start'])
+        window['end'] = int(window['end'])
+    return windows
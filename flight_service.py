@@ -0,0 +1,166 @@
+import json
+import sys
+import threading
+import time
+import numpy as np
+import pandas as pd
+from bisect import bisect_right
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from best_window import find_best_windows_from_counts
+from flight_db import connect
+from local_time import airport_timezone, flights_timezone, to_local_time
+
+# Long-running JSON service over vilnius_airport.db, so dashboards don't start Python, import
+# pandas and load the table on every refresh:
+#   /upcoming?n=10           next n flights
+#   /best-window?minutes=30  best non-overlapping windows (optional k=3)
+db_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/vilnius_airport.db'
+port = 8025
+
+# How often (in seconds) a request may check the database for changes
+refresh_interval = 1
+
+# Largest n and k a request may ask for
+max_results = 500
+
+upcoming_query = '''
+SELECT flight_type, airline, origin_or_destination, callsign, scheduled_time, estimated_time, status_text, local_timezone
+FROM flights
+WHERE scheduled_time > ?
+ORDER BY scheduled_time
+'''
+
+
+# One loaded state of the index: flight times, the flights in the same order, their timezone and
+# the windows computed from them. A refresh builds a new one and publishes it with one assignment,
+# so a request always reads times, flights and cache from the same load.
+FlightSnapshot = namedtuple('FlightSnapshot', ['times', 'flights', 'timezone', 'window_cache'])
+
+
+# In-memory index of future flights, sorted by scheduled_time. It's reloaded only when
+# PRAGMA data_version says another connection (the ingester) has committed, and then only
+# the future range is read through the scheduled_time index.
+class FlightIndex:
+    def __init__(self, db_path, clock=time.time):
+        self.conn = connect(db_path, read_only=True, check_same_thread=False)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.data_version = None
+        self.checked_at = None
+        self.snapshot = FlightSnapshot(np.array([], dtype=np.int64), [], airport_timezone, {})
+
+    # Function to reload the future flights if the database changed since the last check
+    def refresh(self):
+        now = self.clock()
+        with self.lock:
+            if self.checked_at is not None and now - self.checked_at < refresh_interval:
+                return
+            self.checked_at = now
+            data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self.data_version:
+                return
+
+            df = pd.read_sql_query(upcoming_query, self.conn, params=(int(now),))
+            timezone = flights_timezone(df)
+            for column in ('scheduled_time', 'estimated_time'):
+                local_times = to_local_time(df[column], timezone)
+                df[column + '_local'] = [None if pd.isna(t) else t.isoformat() for t in local_times]
+                df[column] = df[column].astype('Int64')
+            df = df.drop(columns='local_timezone').astype(object).where(df.notna(), None)
+
+            self.snapshot = FlightSnapshot(df['scheduled_time'].to_numpy(dtype=np.int64), df.to_dict('records'), timezone, {})
+            self.data_version = data_version
+
+    # Function to return the next n flights after now
+    def upcoming(self, n=10):
+        self.refresh()
+        snapshot = self.snapshot
+        first = bisect_right(snapshot.times, int(self.clock()))
+        return snapshot.flights[first:first + n]
+
+    # Function to return the top-k non-overlapping windows of the given length, starting from now.
+    # Results are cached until the data changes or the current minute moves on.
+    def best_windows(self, minutes, k=1):
+        self.refresh()
+        snapshot = self.snapshot
+        now = int(self.clock())
+        key = (minutes, k, now // 60)
+        if key not in snapshot.window_cache:
+            times = snapshot.times[bisect_right(snapshot.times, now):]
+            starts, counts = np.unique(times, return_counts=True)
+            windows = find_best_windows_from_counts(starts, counts, int(minutes * 60), k)
+            for window in windows:
+                window['start'] = int(window['start'])
+                window['end'] = int(window['end'])
+                window['start_local'] = pd.Timestamp(window['start'], unit='s', tz='UTC').tz_convert(snapshot.timezone).isoformat()
+                window['end_local'] = pd.Timestamp(window['end'], unit='s', tz='UTC').tz_convert(snapshot.timezone).isoformat()
+            snapshot.window_cache[key] = windows
+        return snapshot.window_cache[key]
+
+
+class FlightHandler(BaseHTTPRequestHandler):
+    index = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        try:
+            if url.path == '/upcoming':
+                body = {'flights': self.index.upcoming(int_param(params, 'n', 10, max_results))}
+            elif url.path == '/best-window':
+                minutes = int_param(params, 'minutes', None, 24 * 60)
+                body = {'minutes': minutes, 'windows': self.index.best_windows(minutes, int_param(params, 'k', 1, max_results))}
+            else:
+                self.send_error(404)
+                return
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        self.send_json(200, body)
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # Keep the console quiet; dashboards poll often
+    def log_message(self, format, *args):
+        pass
+
+
+# Function to read a positive integer query parameter, up to a limit
+def int_param(params, name, default, limit):
+    if name not in params:
+        if default is None:
+            raise ValueError(f"Missing parameter: {name}")
+        return default
+    try:
+        value = int(params[name][0])
+    except ValueError:
+        raise ValueError(f"Parameter {name} must be an integer")
+    if not 0 < value <= limit:
+        raise ValueError(f"Parameter {name} must be between 1 and {limit}")
+    return value
+
+
+# Function to serve the index over HTTP until interrupted
+def serve(db_path=db_path, port=port):
+    FlightHandler.index = FlightIndex(db_path)
+    FlightHandler.index.refresh()
+    server = ThreadingHTTPServer(('127.0.0.1', port), FlightHandler)
+    print(f"Serving flights from {db_path} on http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve(db_path, int(sys.argv[1]) if len(sys.argv) > 1 else port)
@@ -0,0 +1,274 @@
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from best_window import find_best_windows_from_counts
+
+# pyarrow is optional: only the columnar export and the store readers need it
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Columnar copy of the flights history as Parquet, for analysis that would otherwise pull the whole
+# flights table through pd.read_sql_query row by row. Layout (hive partitions, UTC days):
+#   flights/day=2024-10-13/flight_type=arrival/part.parquet   flights by their scheduled_time's day
+#   flight_events/day=2024-10-13/part-<first id>.parquet       flight_events by their observed_time's day
+# Readers open only the partitions and columns they need. Repeated strings are stored as
+# dictionaries and come back as pandas categoricals.
+db_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/vilnius_airport.db'
+store_dir = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/flights_parquet'
+
+# Columns dictionary-encoded in the files and loaded as categoricals
+categorical_columns = ['airline', 'origin_or_destination', 'model_code', 'aircraft_model', 'country', 'owner_name',
+                       'status_text', 'status_icon', 'local_timezone', 'column_name']
+
+# Partition of flights without a scheduled time
+unscheduled_day = 'unscheduled'
+
+# Export progress (last exported change version and event id), kept next to the data
+state_file = 'export_state.json'
+
+# Days whose flights were written since the last export, by write order rather than by the
+# flights' own timestamps (a backfill writes flights with old last_update_times). Triggers give a
+# day the next version whenever a flight of it is inserted, updated or deleted; an update that
+# moves a flight to another day marks both. Flights without a scheduled time are day -1.
+change_log_table = '''
+    CREATE TABLE store_changes (
+        day_start INTEGER PRIMARY KEY,
+        version INTEGER
+    );
+    CREATE INDEX idx_store_changes_version ON store_changes (version);
+
+    CREATE TRIGGER store_changes_insert AFTER INSERT ON flights
+    BEGIN
+        INSERT INTO store_changes VALUES (COALESCE(NEW.scheduled_time - NEW.scheduled_time % 86400, -1),
+                                          (SELECT COALESCE(MAX(version), 0) + 1 FROM store_changes))
+        ON CONFLICT DO UPDATE SET version = excluded.version;
+    END;
+
+    CREATE TRIGGER store_changes_delete AFTER DELETE ON flights
+    BEGIN
+        INSERT INTO store_changes VALUES (COALESCE(OLD.scheduled_time - OLD.scheduled_time % 86400, -1),
+                                          (SELECT COALESCE(MAX(version), 0) + 1 FROM store_changes))
+        ON CONFLICT DO UPDATE SET version = excluded.version;
+    END;
+
+    CREATE TRIGGER store_changes_update AFTER UPDATE ON flights
+    BEGIN
+        INSERT INTO store_changes
+        SELECT day_start, (SELECT COALESCE(MAX(version), 0) + 1 FROM store_changes) FROM (
+            SELECT COALESCE(OLD.scheduled_time - OLD.scheduled_time % 86400, -1) AS day_start
+            UNION SELECT COALESCE(NEW.scheduled_time - NEW.scheduled_time % 86400, -1)
+        )
+        WHERE true
+        ON CONFLICT DO UPDATE SET version = excluded.version;
+    END;
+'''
+
+# Parquet compression codec
+compression = 'zstd'
+
+
+# Function to fail clearly when pyarrow isn't installed
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("The columnar flight store needs pyarrow (pip install pyarrow)")
+
+
+# Function to get the UTC day (YYYY-MM-DD) of epoch seconds
+def utc_day(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+# Function to get the epoch seconds range [start, end) of a UTC day partition
+def day_range(day):
+    start = int(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp())
+    return start, start + 86400
+
+
+# Function to create store_changes and its triggers, marking every day already stored as changed
+def create_change_log(conn):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='store_changes'").fetchone():
+        return
+    conn.executescript(f'''
+        BEGIN;
+        {change_log_table}
+        INSERT INTO store_changes
+        SELECT DISTINCT COALESCE(scheduled_time - scheduled_time % 86400, -1), 1 FROM flights;
+        COMMIT;
+    ''')
+
+
+# Function to build the Arrow schema of a table from its SQLite column types, so every file has the
+# same schema even when a column is all NULL in one partition. Columns without a type (the event
+# values, which hold both times and statuses) are stored as text.
+def table_schema(conn, table, exclude=()):
+    fields = []
+    for _, name, column_type, *_ in conn.execute(f'PRAGMA table_info({table})'):
+        if name in exclude:
+            continue
+        if column_type.upper() == 'INTEGER':
+            fields.append(pa.field(name, pa.int64()))
+        elif name in categorical_columns:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+# Function to write a DataFrame as one Parquet file with the given schema, replacing any previous one atomically
+def write_parquet(df, path, schema):
+    df = df.astype({field.name: 'string' for field in schema if pa.types.is_string(field.type)})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), path + '.tmp', compression=compression)
+    os.replace(path + '.tmp', path)
+
+
+# Function to rewrite the flights partitions of the given days from the database. Partitions left
+# without flights (deleted, or moved to another day) are removed.
+def export_flight_days(conn, directory, days):
+    schema = table_schema(conn, 'flights', exclude=('flight_type',))
+    for day in sorted(days):
+        if day == unscheduled_day:
+            flights = pd.read_sql_query('SELECT * FROM flights WHERE scheduled_time IS NULL', conn)
+        else:
+            flights = pd.read_sql_query('SELECT * FROM flights WHERE scheduled_time >= ? AND scheduled_time < ?',
+                                        conn, params=day_range(day))
+        day_dir = os.path.join(directory, 'flights', f'day={day}')
+        written = set()
+        for flight_type, group in flights.groupby('flight_type'):
+            write_parquet(group.drop(columns='flight_type'), os.path.join(day_dir, f'flight_type={flight_type}', 'part.parquet'), schema)
+            written.add(f'flight_type={flight_type}')
+        if os.path.isdir(day_dir):
+            for name in set(os.listdir(day_dir)) - written:
+                shutil.rmtree(os.path.join(day_dir, name))
+            if not written:
+                os.rmdir(day_dir)
+
+
+# Function to export the flights and flight_events changed since the last export. Flights are
+# re-exported per day partition when any flight of that day was written since then (as recorded
+# in store_changes, see create_change_log);
+# flight_events are append-only, so only the new rows are written, as new part files.
+# full=True rebuilds the store from scratch in a fresh directory and swaps it in, so partitions
+# of days no longer in the database and old event files don't survive it.
+# Returns the number of flight days and events written.
+def export_store(conn, directory=store_dir, full=False):
+    require_pyarrow()
+    if full:
+        return rebuild_store(conn, directory)
+    state_path = os.path.join(directory, state_file)
+    state = {'last_change': 0, 'last_event_id': 0}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+
+    # Read the watermarks first, so changes made during the export are picked up next time
+    last_change, last_event_id = conn.execute('''
+        SELECT (SELECT COALESCE(MAX(version), 0) FROM store_changes),
+               (SELECT COALESCE(MAX(id), 0) FROM flight_events)
+    ''').fetchone()
+    days = {unscheduled_day if day_start < 0 else utc_day(day_start) for (day_start,) in conn.execute(
+        'SELECT day_start FROM store_changes WHERE version > ? AND version <= ?', (state.get('last_change', 0), last_change))}
+    export_flight_days(conn, directory, days)
+
+    events = pd.read_sql_query('SELECT * FROM flight_events WHERE id > ? AND id <= ? ORDER BY id',
+                               conn, params=(state['last_event_id'], last_event_id))
+    if not events.empty:
+        schema = table_schema(conn, 'flight_events')
+        for day, group in events.groupby(events['observed_time'].map(utc_day)):
+            write_parquet(group, os.path.join(directory, 'flight_events', f'day={day}', f"part-{group['id'].iloc[0]}.parquet"), schema)
+
+    with open(state_path + '.tmp', 'w') as f:
+        json.dump({'last_change': last_change, 'last_event_id': last_event_id, 'export_time': int(time.time())}, f)
+    os.replace(state_path + '.tmp', state_path)
+    return len(days), len(events)
+
+
+# Function to export everything into a fresh directory next to the store and swap it in. The old
+# store is moved aside first, so readers in between see an empty store rather than a mix of both.
+def rebuild_store(conn, directory):
+    directory = os.path.normpath(directory)
+    fresh = directory + '.new'
+    old = directory + '.old'
+    shutil.rmtree(fresh, ignore_errors=True)
+    days, events = export_store(conn, fresh)
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(fresh, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return days, events
+
+
+# Function to build the pyarrow filter selecting the day partitions that overlap [start, end)
+def day_filter(start=None, end=None):
+    condition = None
+    if start is not None:
+        condition = ds.field('day') >= utc_day(start)
+    if end is not None:
+        before_end = ds.field('day') <= utc_day(end - 1)
+        condition = before_end if condition is None else condition & before_end
+    return condition
+
+
+# Function to read flights from the store, opening only the needed partitions and columns. start and
+# end (epoch seconds) bound scheduled_time; flight_types limits the flight_type partitions.
+def read_flights(directory=store_dir, columns=None, start=None, end=None, flight_types=None):
+    require_pyarrow()
+    path = os.path.join(directory, 'flights')
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=columns)
+    partitioning = ds.partitioning(pa.schema([('day', pa.string()), ('flight_type', pa.string())]), flavor='hive')
+    dataset = ds.dataset(path, format='parquet', partitioning=partitioning)
+
+    condition = day_filter(start, end)
+    if start is not None:
+        condition = condition & (ds.field('scheduled_time') >= start)
+    if end is not None:
+        condition = condition & (ds.field('scheduled_time') < end)
+    if flight_types is not None:
+        in_types = ds.field('flight_type').isin(list(flight_types))
+        condition = in_types if condition is None else condition & in_types
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+# Function to load per-bucket flight counts from the store, like flight_rollup.load_bucket_counts
+def load_store_bucket_counts(directory=store_dir, start=None, end=None, flight_type=None, bucket=60):
+    flights = read_flights(directory, ['scheduled_time'], start, end, None if flight_type is None else [flight_type])
+    times = flights['scheduled_time'].dropna().to_numpy(dtype=np.int64)
+    starts, counts = np.unique(times - times % bucket, return_counts=True)
+    return starts, counts
+
+
+# Function to find the top-k non-overlapping windows over the stored history, like
+# flight_rollup.best_windows_from_rollup. Returned starts and ends are epoch seconds.
+def best_windows_from_store(window_minutes, directory=store_dir, start=None, end=None, flight_type=None, k=1):
+    starts, counts = load_store_bucket_counts(directory, start, end, flight_type)
+    if len(starts) == 0:
+        return []
+    windows = find_best_windows_from_counts(starts, counts, int(window_minutes * 60), k)
+    for window in windows:
+        window['start'] = int(window['start'])
+        window['end'] = int(window['end'])
+    return windows
+
+
+if __name__ == "__main__":
+    from flight_db import connect
+
+    # Usage: python flight_store.py [DB_PATH [STORE_DIR]] [--full]
+    paths = [arg for arg in sys.argv[1:] if arg != '--full']
+    directory = paths[1] if len(paths) > 1 else store_dir
+    conn = connect(paths[0] if paths else db_path, read_only=True, tables=('store_changes',))
+    days, events = export_store(conn, directory, full='--full' in sys.argv)
+    conn.close()
+    print(f"Exported {days} flight days and {events} flight events to {directory}")
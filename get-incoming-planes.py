@@ -1,35 +1,26 @@
-import sqlite3
+import time
 import pandas as pd
-from datetime import datetime
 from tabulate import tabulate  # Install using: pip install tabulate
+from flight_db import connect
+from local_time import localize_columns
 
-# Connect to the SQLite database
+# Connect to the SQLite database (read-only, so the query never stalls the ingester)
 db_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/vilnius_airport.db'
-conn = sqlite3.connect(db_path)
+conn = connect(db_path, read_only=True)
 
-# Query the database to get scheduled times for arrivals and departures, including airline and origin/destination
+# Query the database for the 10 next upcoming flights (times are stored as UTC epoch seconds),
+# including airline and origin/destination
 query = '''
-SELECT flight_type, airline, origin_or_destination, scheduled_time, estimated_time, callsign
+SELECT flight_type, airline, origin_or_destination, scheduled_time, estimated_time, callsign, local_timezone
 FROM flights
+WHERE scheduled_time > ?
+ORDER BY scheduled_time
+LIMIT 10
 '''
-df = pd.read_sql_query(query, conn)
+next_flights = pd.read_sql_query(query, conn, params=(int(time.time()),))
 
-# Convert scheduled_time and estimated_time columns to datetime
-df['scheduled_time'] = pd.to_datetime(df['scheduled_time'])
-df['estimated_time'] = pd.to_datetime(df['estimated_time'])
-
-# Add 3 hours to each scheduled time (to account for UTC+3)
-df['scheduled_time'] = df['scheduled_time'] + pd.Timedelta(hours=3)
-df['estimated_time'] = df['estimated_time'] + pd.Timedelta(hours=3)
-
-# Get the current time
-current_time = datetime.now()
-
-# Filter the data to get only upcoming flights and sort by scheduled_time
-upcoming_flights = df[df['scheduled_time'] > current_time].sort_values(by='scheduled_time')
-
-# Get the 10 most recent upcoming flights
-next_flights = upcoming_flights.head(10)
+# Convert scheduled_time and estimated_time columns to the airport's local time (EET/EEST)
+localize_columns(next_flights, ['scheduled_time', 'estimated_time'], naive=True)
 
 # Format the data using tabulate for clean table output
 table = tabulate(next_flights[['flight_type', 'callsign', 'origin_or_destination', 'scheduled_time', 'estimated_time']],
@@ -0,0 +1,30 @@
+import pandas as pd
+
+# Timezone of Vilnius airport, used for flights stored before the payload's timezone was recorded
+airport_timezone = 'Europe/Vilnius'
+
+
+# Function to convert a column of UTC epoch seconds to tz-aware local times in one vectorized step.
+# The zone's DST rules are applied per timestamp, so EET and EEST times are both correct.
+def to_local_time(epoch_seconds, timezone=airport_timezone):
+    return pd.to_datetime(epoch_seconds, unit='s', utc=True).dt.tz_convert(timezone)
+
+
+# Function to pick the timezone recorded with the flights of a DataFrame (one airport, one zone)
+def flights_timezone(df):
+    if 'local_timezone' in df.columns:
+        zones = df['local_timezone'].dropna()
+        if not zones.empty:
+            return zones.iloc[0]
+    return airport_timezone
+
+
+# Function to convert epoch columns of a DataFrame to local time in place. naive=True drops
+# the timezone after converting, for printing wall-clock times in tables.
+def localize_columns(df, columns, naive=False):
+    timezone = flights_timezone(df)
+    for column in columns:
+        df[column] = to_local_time(df[column], timezone)
+        if naive:
+            df[column] = df[column].dt.tz_localize(None)
+    return timezone
@@ -1,30 +1,43 @@
-import sqlite3
+import sys
+import time
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+from datetime import timedelta
 from tabulate import tabulate
-
-# Connect to the SQLite database
+from flight_db import connect
+from delay_model import best_windows_from_predictions, load_future_flights
+from flight_rollup import best_windows_from_rollup, load_bucket_counts
+from weighted_window import find_weighted_windows
+from density_plot import render_day_tiles, render_density
+from local_time import localize_columns, to_local_time
+
+# Connect to the SQLite database (read-only, so the queries never stall the ingester);
+# another database can be given as the first argument
 db_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/vilnius_airport.db'
-conn = sqlite3.connect(db_path)
+conn = connect(sys.argv[1] if len(sys.argv) > 1 else db_path, read_only=True, tables=('flight_counts', 'delay_stats'))
+
+# Number of non-overlapping windows to suggest
+top_k = 3
 
-# Query the database to get scheduled times for arrivals and departures, including airline and origin/destination
-query = '''
-SELECT flight_type, origin_or_destination, scheduled_time, estimated_time, callsign
-FROM flights
-'''
-df = pd.read_sql_query(query, conn)
+# Rank windows by predicted movement times (the API's estimate, else the scheduled time plus the
+# delay learned from history, see delay_model.py) instead of by scheduled times
+use_delay_model = True
 
-# Convert scheduled_time to datetime and adjust to UTC+3
-df['scheduled_time'] = pd.to_datetime(df['scheduled_time']) + timedelta(hours=3)
-df['estimated_time'] = pd.to_datetime(df['estimated_time']) + timedelta(hours=3)
+# Rank windows by the total weight of their flights (rules in weighted_window.py, e.g. widebodies
+# count more) instead of by the number of flights; needs use_delay_model
+use_weights = False
 
-# Filter for future flights only
-current_time = datetime.now()  # Adjust current time to UTC+3
-df = df[df['scheduled_time'] > current_time]
+# How to draw the flight density chart: 'show' opens the interactive bar chart, 'file' writes
+# plot_path headless (PNG or SVG by extension) and 'tiles' writes one cached image per local
+# day to density_plot.tile_dir, re-rendering only the days whose counts changed
+plot_mode = 'show'
+plot_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/flight_density.png'
 
-# Check if there are any future flights
-if df.empty:
+# Current time as epoch seconds; only future flights are considered
+now = int(time.time())
+
+# Check if there are any future flights (the per-minute rollup answers this without touching the flights table)
+if conn.execute('SELECT 1 FROM flight_counts WHERE bucket_start >= ? AND flights > 0 LIMIT 1', (now,)).fetchone() is None:
     print("No future flights available.")
 else:
     # Get user input for the time window in minutes
@@ -34,36 +47,43 @@ else:
     if time_window <= 0:
         raise ValueError("Time window must be a positive integer.")
 
-    # Initialize variables to track the best time and maximum flights
-    max_flights = 0
-    best_time = None
-
-    # Loop through each scheduled time to calculate the number of flights in the specified time window
-    for index, row in df.iterrows():
-        start_time = row['scheduled_time']
-        end_time = start_time + timedelta(minutes=time_window)
-
-        # Count the number of flights scheduled in the next time window
-        flight_count = df[(df['scheduled_time'] >= start_time) & (df['scheduled_time'] < end_time)].shape[0]
-
-        # Check if this count is the highest found so far
-        if flight_count > max_flights:
-            max_flights = flight_count
-            best_time = start_time
+    if use_delay_model:
+        # Predict when each flight will really arrive or depart and search windows over those times
+        future_flights = load_future_flights(conn, now)
+        if use_weights:
+            best_windows = find_weighted_windows(future_flights, time_window, k=top_k)
+        else:
+            best_windows = best_windows_from_predictions(future_flights['predicted_time'], time_window, k=top_k)
+    else:
+        # Find the best time windows with prefix sums over the per-minute flight counts
+        best_windows = best_windows_from_rollup(conn, time_window, start=now, k=top_k)
 
     # Display the result
-    if best_time:
-        # Print out the times of flights in the best time window
-        highlight_start = best_time
-        highlight_end = best_time + timedelta(minutes=time_window)  # User-defined time window
-        flights_in_window = df[(df['scheduled_time'] >= highlight_start) & (df['scheduled_time'] < highlight_end)]
-
-        # Sort flights by scheduled_time
-        flights_in_window = flights_in_window.sort_values(by='scheduled_time')
+    if best_windows:
+        max_flights = best_windows[0]['count']
+
+        if use_delay_model:
+            # The flights predicted to move in the best time window
+            predicted = future_flights['predicted_time']
+            flights_in_window = future_flights[(predicted >= best_windows[0]['start']) & (predicted < best_windows[0]['end'])].copy()
+        else:
+            # Query the flights in the best time window (times are stored as UTC epoch seconds)
+            query = '''
+            SELECT flight_type, origin_or_destination, scheduled_time, estimated_time, callsign, local_timezone
+            FROM flights
+            WHERE scheduled_time >= ? AND scheduled_time < ?
+            ORDER BY scheduled_time
+            '''
+            flights_in_window = pd.read_sql_query(query, conn, params=(best_windows[0]['start'], best_windows[0]['end']))
+            flights_in_window['predicted_time'] = flights_in_window['scheduled_time']
+
+        # Convert the times to the airport's local time (tz-aware, EET/EEST)
+        timezone = localize_columns(flights_in_window, ['scheduled_time', 'estimated_time', 'predicted_time'])
+        best_time = pd.Timestamp(best_windows[0]['start'], unit='s', tz='UTC').tz_convert(timezone)
 
         # Print in a table format
         print("\nFlights arriving and departing during the best time window:")
-        print(tabulate(flights_in_window[['flight_type', 'callsign', 'origin_or_destination', 'scheduled_time', 'estimated_time']], 
+        print(tabulate(flights_in_window[['flight_type', 'callsign', 'origin_or_destination', 'scheduled_time', 'estimated_time', 'predicted_time']], 
                         headers='keys', 
                         tablefmt='grid', 
                         showindex=False, 
@@ -72,41 +92,58 @@ else:
         print(f"The best time to arrive at the airport is: {best_time.strftime('%Y-%m-%d %H:%M:%S')} "
               f"with approximately {max_flights} flights expected in the next {time_window} minutes.")
 
-        # Create a new DataFrame to count flights by time intervals
-        df.set_index('scheduled_time', inplace=True)
-        flight_counts = df.resample('10T').size()  # Count flights every 10 minutes
-
-        # Plot the data
-        plt.figure(figsize=(14, 7))
-        flight_counts.plot(kind='bar', color='skyblue', edgecolor='black')
-
-        # Highlight the best time window
-        best_window_start = best_time.floor('T')  # Round down to the nearest minute
-        best_window_end = best_window_start + timedelta(minutes=time_window)
-
-        # Convert the best_window_start and best_window_end to the appropriate indices for the bar plot
-        bar_start_index = int((best_window_start - flight_counts.index[0]).total_seconds() / 600)  # 600 seconds = 10 minutes
-        bar_end_index = int((best_window_end - flight_counts.index[0]).total_seconds() / 600)  # 600 seconds = 10 minutes
-
-        plt.axvspan(bar_start_index, bar_end_index, color='orange', alpha=0.5, label='Best Time Window')
-
-        # Formatting the plot
-        plt.title('Number of Flights Over Time')
-        plt.xlabel('Scheduled Time')
-        plt.ylabel('Number of Flights')
-
-        # Limit the number of x-ticks
-        total_ticks = len(flight_counts)
-        plt.xticks(ticks=range(0, total_ticks, max(1, total_ticks // 20)),  # Show 5% of the ticks
-                   labels=flight_counts.index[::max(1, total_ticks // 20)].strftime('%Y-%m-%d %H:%M:%S'), 
-                   rotation=45)
-
-        plt.legend()
-        plt.grid(axis='y')
-        plt.tight_layout()
-
-        # Show the plot
-        plt.show()
+        # Print the runner-up windows that don't overlap with the best one
+        for window in best_windows[1:]:
+            print(f"Alternative: {pd.Timestamp(window['start'], unit='s', tz='UTC').tz_convert(timezone).strftime('%Y-%m-%d %H:%M:%S')} "
+                  f"with approximately {window['count']} flights expected in the next {time_window} minutes.")
+
+        # Count flights every 10 minutes (by predicted time, or from the rollup), filling empty intervals with zero
+        if use_delay_model:
+            bucket_starts, bucket_counts = np.unique(future_flights['predicted_time'] // 600 * 600, return_counts=True)
+        else:
+            bucket_starts, bucket_counts = load_bucket_counts(conn, start=now, bucket=600)
+        best_window_span = (best_windows[0]['start'], best_windows[0]['start'] + time_window * 60)
+        if plot_mode == 'tiles':
+            tiles, rendered = render_day_tiles(bucket_starts, bucket_counts, highlight=best_window_span, timezone=timezone)
+            print(f"Wrote {len(tiles)} day charts ({rendered} re-rendered), e.g. {tiles[0]}")
+        elif plot_mode == 'file':
+            render_density(bucket_starts, bucket_counts, plot_path, highlight=best_window_span, timezone=timezone)
+            print(f"Wrote the chart to {plot_path}")
+        else:
+            import matplotlib.pyplot as plt
+            flight_counts = pd.Series(bucket_counts, index=to_local_time(pd.Series(bucket_starts))).resample('10min').sum()
+
+            # Plot the data
+            plt.figure(figsize=(14, 7))
+            flight_counts.plot(kind='bar', color='skyblue', edgecolor='black')
+
+            # Highlight the best time window
+            best_window_start = best_time.floor('min')  # Round down to the nearest minute
+            best_window_end = best_window_start + timedelta(minutes=time_window)
+
+            # Convert the best_window_start and best_window_end to the appropriate indices for the bar plot
+            bar_start_index = int((best_window_start - flight_counts.index[0]).total_seconds() / 600)  # 600 seconds = 10 minutes
+            bar_end_index = int((best_window_end - flight_counts.index[0]).total_seconds() / 600)  # 600 seconds = 10 minutes
+
+            plt.axvspan(bar_start_index, bar_end_index, color='orange', alpha=0.5, label='Best Time Window')
+
+            # Formatting the plot
+            plt.title('Number of Flights Over Time')
+            plt.xlabel('Scheduled Time')
+            plt.ylabel('Number of Flights')
+
+            # Limit the number of x-ticks
+            total_ticks = len(flight_counts)
+            plt.xticks(ticks=range(0, total_ticks, max(1, total_ticks // 20)),  # Show 5% of the ticks
+                       labels=flight_counts.index[::max(1, total_ticks // 20)].strftime('%Y-%m-%d %H:%M:%S'), 
+                       rotation=45)
+
+            plt.legend()
+            plt.grid(axis='y')
+            plt.tight_layout()
+
+            # Show the plot
+            plt.show()
 
     else:
         print("No flights found.")
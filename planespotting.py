@@ -0,0 +1,281 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from flight_db import connect
+
+# Single entry point for the planespotting scripts:
+#   python planespotting.py upcoming [-n 10]
+#   python planespotting.py best-window MINUTES [-k 3] [--weighted] [--daylight] [--type arrival] [--min-gap 2] [--weather]
+#   python planespotting.py best-window MINUTES --store DIR [--since 2024-10-01]   (busiest windows in the history)
+#   python planespotting.py export [--dir DIR] [--full]
+#   python planespotting.py rare [-n 10] [--hours 24]
+#   python planespotting.py tiles [--dir DIR] [--store DIR]
+#   python planespotting.py plot | ingest [--backfill ...] | fetch | serve [port]
+# --db is passed on to ingest and plot; fetch only writes the snapshot JSON files, so it doesn't use it.
+# Only sqlite3 (through flight_db) is imported up front. numpy, pandas, matplotlib and the API client are imported
+# inside the subcommands that need them, so the tabular commands start in a few tens of ms.
+db_path = 'C:/Users/zabit/Documents/GitHub/planespotting-time-finder/vilnius_airport.db'
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Timezone used when the flights have none recorded (same as local_time.airport_timezone)
+airport_timezone = 'Europe/Vilnius'
+
+
+# Function to format epoch seconds as the airport's local wall-clock time
+def format_local_time(epoch_seconds, timezone):
+    if epoch_seconds is None:
+        return ''
+    from zoneinfo import ZoneInfo
+    return datetime.fromtimestamp(epoch_seconds, ZoneInfo(timezone)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Function to print rows as a grid table, in the same layout as tabulate's 'grid' format
+def print_table(headers, rows):
+    rows = [['' if value is None else str(value) for value in row] for row in rows]
+    widths = [max([len(header)] + [len(row[i]) for row in rows]) for i, header in enumerate(headers)]
+    line = '+' + '+'.join('-' * (width + 2) for width in widths) + '+'
+    print(line)
+    print('| ' + ' | '.join(header.ljust(width) for header, width in zip(headers, widths)) + ' |')
+    print(line.replace('-', '='))
+    for row in rows:
+        print('| ' + ' | '.join(value.ljust(width) for value, width in zip(row, widths)) + ' |')
+        print(line)
+
+
+# Function to print the next n upcoming flights
+def upcoming(args):
+    conn = connect(args.db, read_only=True)
+    rows = conn.execute('''
+        SELECT flight_type, callsign, origin_or_destination, scheduled_time, estimated_time, local_timezone
+        FROM flights
+        WHERE scheduled_time > ?
+        ORDER BY scheduled_time
+        LIMIT ?
+    ''', (int(time.time()), args.n)).fetchall()
+    conn.close()
+    if not rows:
+        print("No future flights available.")
+        return
+
+    timezone = next((row[5] for row in rows if row[5]), airport_timezone)
+    print_table(['flight_type', 'callsign', 'origin_or_destination', 'scheduled_time', 'estimated_time'],
+                [row[:3] + (format_local_time(row[3], timezone), format_local_time(row[4], timezone)) for row in rows])
+
+
+# Function to print the best non-overlapping time windows and the flights in the best one
+def best_window(args):
+    from flight_rollup import best_windows_from_rollup
+
+    if args.minutes <= 0:
+        raise SystemExit("Time window must be a positive integer.")
+    if args.store:
+        history_best_window(args)
+        return
+    if args.weighted or args.daylight or args.type or args.min_gap or args.weather:
+        weighted_best_window(args)
+        return
+    conn = connect(args.db, read_only=True, tables=('flight_counts',))
+    windows = best_windows_from_rollup(conn, args.minutes, start=int(time.time()), k=args.k)
+    if not windows:
+        print("No future flights available.")
+        conn.close()
+        return
+
+    rows = conn.execute('''
+        SELECT flight_type, callsign, origin_or_destination, scheduled_time, estimated_time, local_timezone
+        FROM flights
+        WHERE scheduled_time >= ? AND scheduled_time < ?
+        ORDER BY scheduled_time
+    ''', (windows[0]['start'], windows[0]['end'])).fetchall()
+    conn.close()
+
+    timezone = next((row[5] for row in rows if row[5]), airport_timezone)
+    print("Flights arriving and departing during the best time window:")
+    print_table(['flight_type', 'callsign', 'origin_or_destination', 'scheduled_time', 'estimated_time'],
+                [row[:3] + (format_local_time(row[3], timezone), format_local_time(row[4], timezone)) for row in rows])
+    print(f"The best time to arrive at the airport is: {format_local_time(windows[0]['start'], timezone)} "
+          f"with approximately {windows[0]['count']} flights expected in the next {args.minutes} minutes.")
+    for window in windows[1:]:
+        print(f"Alternative: {format_local_time(window['start'], timezone)} "
+              f"with approximately {window['count']} flights expected in the next {args.minutes} minutes.")
+
+
+# Function to print the busiest windows in the flights history, read from the Parquet store
+def history_best_window(args):
+    from flight_store import best_windows_from_store
+
+    start = int(datetime.fromisoformat(args.since).replace(tzinfo=timezone.utc).timestamp()) if args.since else None
+    windows = best_windows_from_store(args.minutes, args.store, start=start, flight_type=args.type, k=args.k)
+    if not windows:
+        print("No flights in the store.")
+        return
+    for label, window in zip(["The busiest time window was"] + ["Alternative"] * len(windows), windows):
+        print(f"{label}: {format_local_time(window['start'], airport_timezone)} "
+              f"with {window['count']} flights in {args.minutes} minutes.")
+
+
+# Function to print the best windows by total weight of the flights (see weighted_window.py), over
+# predicted movement times, with the flights that count in the best one. With --weather the weights
+# are lowered in poor visibility or precipitation, and the runway in use is shown.
+def weighted_best_window(args):
+    from airport_weather import find_weather_windows, runway_sides
+    from delay_model import load_future_flights
+    from weighted_window import find_weighted_windows, weight_rules
+
+    conn = connect(args.db, read_only=True, tables=('delay_stats', 'weather') if args.weather else ('delay_stats',))
+    flights = load_future_flights(conn, int(time.time()))
+    options = dict(k=args.k, rules=weight_rules if args.weighted else {}, flight_types=[args.type] if args.type else None,
+                   daylight_only=args.daylight, min_gap=args.min_gap)
+    if args.weather:
+        windows = find_weather_windows(conn, flights, args.minutes, **options)
+    else:
+        windows = find_weighted_windows(flights, args.minutes, **options)
+    conn.close()
+    if not windows:
+        print("No future flights available.")
+        return
+
+    in_window = windows[0]['flights'].astype(object)
+    in_window = in_window.where(in_window.notna(), None)
+    timezone = next((zone for zone in in_window['local_timezone'] if zone), airport_timezone)
+    print("Flights counted in the best time window:")
+    print_table(['flight_type', 'callsign', 'origin_or_destination', 'predicted_time', 'aircraft', 'weight'],
+                [(flight.flight_type, flight.callsign, flight.origin_or_destination, format_local_time(flight.predicted_time, timezone),
+                  flight.aircraft_model or flight.model_code, f"{flight.weight:g}") for flight in in_window.itertuples()])
+    for label, window in zip(["The best time to arrive at the airport is"] + ["Alternative"] * len(windows), windows):
+        print(f"{label}: {format_local_time(window['start'], timezone)} with a score of {window['score']:g} "
+              f"from {window['count']} flights expected in the next {args.minutes} minutes.")
+        if args.weather:
+            weather = ', '.join(filter(None, [f"visibility {window['visibility_m']} m" if window['visibility_m'] is not None else None,
+                                              window['weather_codes']]))
+            runway = f"runway {window['runway']} ({runway_sides(window['runway'])})" if window['runway'] else "runway unknown"
+            print(f"    {weather or 'no recent weather'}; {runway}")
+
+
+# Function to print the rarest aircraft expected in the next hours
+def rare(args):
+    from aircraft_index import rank_upcoming_by_rarity
+
+    conn = connect(args.db, read_only=True, tables=('aircraft', 'aircraft_types'))
+    flights = rank_upcoming_by_rarity(conn, hours=args.hours, limit=args.n)
+    conn.close()
+    if not flights:
+        print("No future flights available.")
+        return
+
+    timezone = next((flight['local_timezone'] for flight in flights if flight['local_timezone']), airport_timezone)
+    print_table(['rarity', 'flight_type', 'callsign', 'origin_or_destination', 'scheduled_time', 'aircraft', 'registration', 'visits', 'owner'],
+                [(f"{flight['rarity']:.1f}", flight['flight_type'], flight['callsign'], flight['origin_or_destination'],
+                  format_local_time(flight['scheduled_time'], timezone), flight['aircraft_model'], flight['registration'],
+                  flight['visits'], flight['owner_name']) for flight in flights])
+
+
+# Function to run one of the existing scripts as if it was started directly, passing the remaining arguments
+def run_script(name, argv=()):
+    import runpy
+
+    sys.argv = [name] + list(argv)
+    runpy.run_path(os.path.join(script_dir, name), run_name='__main__')
+
+
+# Function to render the per-day flight density charts, re-rendering only the days that changed
+def tiles(args):
+    from density_plot import bucket_seconds, render_day_tiles
+    from flight_rollup import load_bucket_counts
+
+    if args.store:
+        from flight_store import load_store_bucket_counts
+        bucket_starts, bucket_counts = load_store_bucket_counts(args.store, bucket=bucket_seconds)
+    else:
+        conn = connect(args.db, read_only=True, tables=('flight_counts',))
+        bucket_starts, bucket_counts = load_bucket_counts(conn, bucket=bucket_seconds)
+        conn.close()
+    paths, rendered = render_day_tiles(bucket_starts, bucket_counts, args.dir)
+    print(f"{len(paths)} day charts in {args.dir}, {rendered} rendered")
+
+
+# Function to export the flights history to the Parquet store, only the days that changed unless --full
+def export(args):
+    from flight_store import export_store
+
+    conn = connect(args.db, read_only=True, tables=('store_changes',))
+    days, events = export_store(conn, args.dir, full=args.full)
+    conn.close()
+    print(f"Exported {days} flight days and {events} flight events to {args.dir}")
+
+
+def plot(args):
+    run_script('make-graph-calculate-time.py', [args.db])
+
+
+def ingest(args):
+    run_script('find-daparture-and-arrival-in-VNO.py', ['--db', args.db] + args.script_args)
+
+
+def fetch(args):
+    run_script('read-api.py')
+
+
+def serve(args):
+    from flight_service import serve as serve_flights
+    serve_flights(args.db, args.port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='planespotting', description="Find the best time to go planespotting at Vilnius airport.")
+    parser.add_argument('--db', default=db_path, help="path to vilnius_airport.db (fetch writes snapshot files, not the database)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    upcoming_parser = subparsers.add_parser('upcoming', help="show the next upcoming flights")
+    upcoming_parser.add_argument('-n', type=int, default=10, help="number of flights to show")
+    upcoming_parser.set_defaults(handler=upcoming)
+
+    best_window_parser = subparsers.add_parser('best-window', help="find the busiest time windows")
+    best_window_parser.add_argument('minutes', type=int, help="length of the time window in minutes")
+    best_window_parser.add_argument('-k', type=int, default=3, help="number of non-overlapping windows to suggest")
+    best_window_parser.add_argument('--weighted', action='store_true', help="score flights by the weight rules in weighted_window.py")
+    best_window_parser.add_argument('--daylight', action='store_true', help="only count movements in daylight")
+    best_window_parser.add_argument('--type', choices=['arrival', 'departure'], help="only count arrivals or departures")
+    best_window_parser.add_argument('--min-gap', type=int, default=0, help="minimum minutes between two counted movements")
+    best_window_parser.add_argument('--store', help="search the flights history in this Parquet store (see export)")
+    best_window_parser.add_argument('--since', help="with --store, only flights from this UTC date on (YYYY-MM-DD)")
+    best_window_parser.add_argument('--weather', action='store_true', help="downweight poor visibility and precipitation, show the runway in use")
+    best_window_parser.set_defaults(handler=best_window)
+
+    rare_parser = subparsers.add_parser('rare', help="rank upcoming flights by how rare their aircraft is")
+    rare_parser.add_argument('-n', type=int, default=10, help="number of flights to show")
+    rare_parser.add_argument('--hours', type=int, default=24, help="how far ahead to look")
+    rare_parser.set_defaults(handler=rare)
+
+    tiles_parser = subparsers.add_parser('tiles', help="render cached per-day flight density charts (density_plot.py)")
+    tiles_parser.add_argument('--dir', default=os.path.join(script_dir, 'plot_tiles'), help="directory of the charts")
+    tiles_parser.add_argument('--store', help="read the counts from this Parquet store instead of the database")
+    tiles_parser.set_defaults(handler=tiles)
+
+    export_parser = subparsers.add_parser('export', help="export the flights history to Parquet (flight_store.py)")
+    export_parser.add_argument('--dir', default=os.path.join(script_dir, 'flights_parquet'), help="directory of the store")
+    export_parser.add_argument('--full', action='store_true', help="rewrite every partition")
+    export_parser.set_defaults(handler=export)
+
+    subparsers.add_parser('plot', help="plot flights over time (make-graph-calculate-time.py)").set_defaults(handler=plot)
+
+    # Any further arguments (e.g. --backfill) are passed on to the ingester
+    subparsers.add_parser('ingest', help="ingest snapshots into the database (find-daparture-and-arrival-in-VNO.py)").set_defaults(handler=ingest)
+
+    subparsers.add_parser('fetch', help="fetch schedules from the API (read-api.py)").set_defaults(handler=fetch)
+
+    serve_parser = subparsers.add_parser('serve', help="serve upcoming flights and best windows as JSON (flight_service.py)")
+    serve_parser.add_argument('port', type=int, nargs='?', default=8025)
+    serve_parser.set_defaults(handler=serve)
+
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.handler is not ingest:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.script_args = extra
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import math
+import time
+
+# Poll intervals in seconds. Only the near-term page (the one holding the next flights) is
+# polled every min_interval, while it has a live flight or a flight within imminent_window.
+# Any other page, or the near-term page with nothing imminent, waits at least idle_interval,
+# the spacing the old fixed loop gave every page (about four requests at its 70-360 s pauses).
+# Further out a page is due once lead_fraction of the time left until its next flight has
+# passed, and every max_interval when nothing is scheduled ahead (overnight, or history pages
+# whose flights have all happened).
+min_interval = 120
+idle_interval = 15 * 60
+max_interval = 3600
+imminent_window = 45 * 60
+lead_fraction = 0.25
+
+# Total request budget over every page: at most request_budget requests per budget_period,
+# the rate of the old fixed loop (about 600 requests in 36 hours), in bursts of up to
+# budget_burst. Due pages that find the budget spent wait, most overdue first.
+request_budget = 600
+budget_period = 36 * 60 * 60
+budget_burst = 4
+
+# Wait after a failed request, doubled for every further failure of the same page, up to max_interval
+failure_backoff = 5 * 60
+
+
+# Function to get the poll interval of a page from its next flight time (epoch seconds, or None)
+def poll_interval(next_time, live, now, near_term=True):
+    if near_term and (live or (next_time is not None and next_time - now <= imminent_window)):
+        return min_interval
+    if next_time is None:
+        return max_interval
+    return min(max_interval, max(idle_interval, (next_time - now) * lead_fraction))
+
+
+# Scheduler deciding when each page (any hashable key) is polled next, within a total request
+# budget. Time only comes from the clock passed in, so it can be driven by a simulated clock.
+class PollScheduler:
+    def __init__(self, clock=time.time, budget=request_budget, period=budget_period, burst=budget_burst):
+        self.clock = clock
+        self.next_due = {}
+        self.failures = {}
+        self.rate = budget / period
+        self.burst = burst
+        self.tokens = burst
+        self.refilled = clock()
+
+    # Function to top up the request budget for the time passed since the last top-up
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    # Function to check if a page should be polled now; pages never polled are always due
+    def is_due(self, key):
+        return self.next_due.get(key, 0) <= self.clock()
+
+    # Function to take a request from the budget for a page if it's due. A required page (one
+    # there's no cached copy of) only has to be due, and may overdraw the budget.
+    def claim(self, key, required=False):
+        now = self.clock()
+        if self.next_due.get(key, 0) > now:
+            return False
+        self.refill(now)
+        if self.tokens < 1 and not required:
+            return False
+        self.tokens -= 1
+        return True
+
+    # Function to order pages by how overdue they are, most overdue (or never polled) first
+    def by_priority(self, keys):
+        return sorted(keys, key=lambda key: self.next_due.get(key, 0))
+
+    # Function to schedule the next poll of a page after it was polled; returns the interval
+    def record(self, key, next_time, live, near_term=True):
+        now = self.clock()
+        interval = poll_interval(next_time, live, now, near_term)
+        self.next_due[key] = now + interval
+        self.failures.pop(key, None)
+        return interval
+
+    # Function to push back the next poll of a page whose request failed; returns the wait
+    def record_failure(self, key):
+        self.failures[key] = self.failures.get(key, 0) + 1
+        wait = min(max_interval, failure_backoff * 2 ** (self.failures[key] - 1))
+        self.next_due[key] = self.clock() + wait
+        return wait
+
+    # Function to stop scheduling a page, e.g. when the schedule has fewer pages than before
+    def forget(self, key):
+        self.next_due.pop(key, None)
+        self.failures.pop(key, None)
+
+    # Function to get the seconds until the next page is due and the budget has a request for it
+    # (0 if one can be polled already)
+    def time_until_due(self):
+        if not self.next_due:
+            return 0
+        now = self.clock()
+        self.refill(now)
+        # Rounded up to whole seconds, so a budget a hair short of one request doesn't spin the loop
+        return max(0, min(self.next_due.values()) - now, math.ceil((1 - self.tokens) / self.rate))
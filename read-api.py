@@ -1,15 +1,19 @@
-import requests
+import asyncio
 import json
-import time
-import random
+import os
 from datetime import datetime
+from async_fetcher import AsyncFetcher
+from poll_scheduler import PollScheduler
+from schedule_pages import fetch_schedule
+from snapshot_archive import append_snapshot
 
 # Function to get the current timestamp
 def get_current_timestamp():
     return int(datetime.now().timestamp())
 
-# Base URL for the API
-base_url = "https://api.flightradar24.com/common/v1/airport.json?code=vno&plugin[]=&plugin-setting[schedule][mode]={mode}&plugin-setting[schedule][timestamp]={timestamp}&page={page}&limit=100&fleet=&token="
+# Base URL for the API (point api_root at a local stub server such as serve-snapshots.py for testing)
+api_root = "https://api.flightradar24.com"
+base_url = api_root + "/common/v1/airport.json?code=vno&plugin[]=&plugin-setting[schedule][mode]={mode}&plugin-setting[schedule][timestamp]={timestamp}&page={page}&limit=100&fleet=&token="
 
 # Headers to simulate a Chrome browser request
 headers = {
@@ -19,36 +23,56 @@ headers = {
     "Connection": "keep-alive",
 }
 
-# Function to fetch data and save as JSON
-def fetch_and_save(mode, page):
-    timestamp = get_current_timestamp()
-    url = base_url.format(mode=mode, page=page, timestamp=timestamp)
-    
+# Append-only, compressed history of every merged snapshot (see snapshot_archive.py)
+archive_path = "snapshot_archive.ndjson.gz"
+
+# Random pause between two requests to the API, in seconds. Which pages are polled, and how
+# often, is decided by the PollScheduler (see poll_scheduler.py) within its request budget.
+min_pause = 70
+max_pause = 360
+
+# Function to build the URL of a (mode, page) request with a fresh timestamp
+def make_url(mode, page):
+    return lambda: base_url.format(mode=mode, page=page, timestamp=get_current_timestamp())
+
+# Function to save a merged schedule as compact JSON
+def save_snapshot(mode, data):
+    # Save to file with UTF-8 encoding, writing a temporary file first and
+    # swapping it in so the ingester never reads a half-written snapshot
+    filename = f"airport_{mode}.json"
+    with open(filename + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))  # ensure_ascii=False allows special characters
+    os.replace(filename + '.tmp', filename)
+    print(f"Data saved to {filename}")
+
+# Function to fetch every page of a mode and save them as one merged snapshot
+async def fetch_and_save(fetcher, mode, cache, scheduler=None):
+    print(f"Fetching {mode}")
+    # A failed page is reported and backed off inside fetch_schedule, which merges its cached copy
+    data = await fetch_schedule(fetcher, mode, make_url, cache, scheduler)
+    if data is None:
+        print(f"{mode} not modified since the last request (or waiting to retry a failed page)")
+    else:
+        save_snapshot(mode, data)
+        append_snapshot(archive_path, mode, data)
+
+# Function to fetch arrivals and departures forever, sharing one fetcher and page cache between cycles.
+# Pages are polled often while their flights are live or imminent and rarely when nothing is scheduled.
+async def fetch_forever():
+    fetcher = AsyncFetcher(headers, min_pause=min_pause, max_pause=max_pause)
+    scheduler = PollScheduler()
+    cache = {}
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # Check for HTTP errors
-        data = response.json()  # Parse JSON response
-
-        # Save to file with UTF-8 encoding
-        filename = f"airport_{mode}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)  # ensure_ascii=False allows special characters
-        print(f"Data saved to {filename}")
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred: {e}")
-
-# Infinite loop to run the script forever
-while True:
-    # Fetch arrivals and departures with random pause
-    for mode in ["arrivals", "departures"]:
-        for page in ["-1", "1"]:
-            print(f"Fetching {mode}, page {page}")
-            fetch_and_save(mode, page)
-            
-            # Add a random pause between 60 to 360 seconds
-            pause_duration1 = random.randint(60, 300)
-            pause_duration2 = random.randint(10, 60)
-            pause_duration2 = random.randint(10, 60)
-            pause_duration = pause_duration1 + pause_duration2
-            print(f"Waiting for {pause_duration} seconds before the next request...")
-            time.sleep(pause_duration)
+        while True:
+            await asyncio.gather(*(fetch_and_save(fetcher, mode, cache, scheduler) for mode in ["arrivals", "departures"]))
+
+            # Sleep until the next page is due
+            delay = scheduler.time_until_due()
+            if delay > 0:
+                print(f"Next poll in {delay:.0f} seconds")
+                await asyncio.sleep(delay)
+    finally:
+        fetcher.close()
+
+if __name__ == "__main__":
+    asyncio.run(fetch_forever())
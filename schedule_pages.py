@@ -0,0 +1,123 @@
+import asyncio
+from snapshot_reader import schedule_path
+
+# Upper bound on pages fetched in each direction, in case the API reports a runaway total
+max_pages = 10
+
+
+# Function to get the schedule block of one mode from an airport.json response
+def schedule_block(data, mode):
+    block = data
+    for key in schedule_path:
+        block = block[key]
+    return block[mode]
+
+
+# Function to get the number of pages the API reports for a schedule response
+def page_total(data, mode):
+    return schedule_block(data, mode).get('page', {}).get('total') or 1
+
+
+# Function to summarize a response for the poll scheduler: the earliest upcoming (estimated, else
+# scheduled) time of a flight that hasn't happened yet, or None, and whether any flight is live
+def page_activity(data, mode, now):
+    here = 'arrival' if mode == 'arrivals' else 'departure'
+    next_time = None
+    live = False
+    for flight in schedule_block(data, mode).get('data') or []:
+        flight = flight['flight']
+        live = live or bool((flight.get('status') or {}).get('live'))
+        times = flight.get('time') or {}
+        if (times.get('real') or {}).get(here):
+            continue
+        expected = (times.get('estimated') or {}).get(here) or (times.get('scheduled') or {}).get(here)
+        if expected and expected >= now and (next_time is None or expected < next_time):
+            next_time = expected
+    return next_time, live
+
+
+# Function to get the identity of a flight: its schedule row number, which every item has.
+# The id is missing on most scheduled flights and appears later, so keying on it would
+# split one flight into two entries when pages disagree on it.
+def flight_key(flight):
+    return flight['flight']['identification'].get('row')
+
+
+# Function to merge the responses of several pages (history first) into one snapshot.
+# A flight seen on several pages keeps its first position and its latest data.
+def merge_pages(mode, responses):
+    flights = {}
+    for data in responses:
+        for flight in schedule_block(data, mode).get('data') or []:
+            flights[flight_key(flight)] = flight
+
+    # Reuse the envelope of the current page, now describing a single page with every flight.
+    # Only the dicts along the schedule path are copied, so the page responses stay untouched.
+    merged = dict(responses[-1])
+    block = merged
+    for key in schedule_path + (mode,):
+        block[key] = dict(block[key])
+        block = block[key]
+    block.update({
+        'data': list(flights.values()),
+        'page': {'current': 1, 'total': 1},
+        'item': dict(block.get('item') or {}, current=len(flights), total=len(flights)),
+    })
+    return merged
+
+
+# Function to fetch every page of one schedule mode and merge them. The current and history
+# pages are fetched first to learn the page counts, then the remaining pages concurrently.
+# Responses are cached per page so that pages answered with 304 Not Modified can still be
+# merged; returns None when no page changed since the last merged snapshot was returned.
+# With a PollScheduler, only the pages that are due and fit the request budget are requested
+# (the current page first, then most overdue first) and the others are taken from the cache.
+# The current page holds the next flights, so it's the only one polled at the fastest rate.
+# A failed page is backed off and its cached copy is merged; until it has one it's left out of
+# the merge, or the mode is skipped (returning None) when it's the current or first history page.
+# Changes not merged yet are remembered in the cache under (mode, 'unsaved'), so a skipped merge
+# is made up on the next call even if every page answers 304 then.
+async def fetch_schedule(fetcher, mode, make_url, cache, scheduler=None):
+    unsaved = (mode, 'unsaved')
+
+    async def get_page(page):
+        key = (mode, page)
+        if scheduler is not None and not scheduler.claim(key, required=key not in cache):
+            return cache.get(key)
+        try:
+            data = await fetcher.fetch_json(key, make_url(mode, page))
+        except Exception as e:
+            print(f"Fetching {mode} page {page} failed: {e}")
+            if scheduler is not None:
+                scheduler.record_failure(key)
+            return cache.get(key)
+        if data is not None:
+            cache[key] = data
+            cache[unsaved] = True
+        if scheduler is not None:
+            scheduler.record(key, *page_activity(cache[key], mode, scheduler.clock()), near_term=page == 1)
+        return cache[key]
+
+    current, history = await asyncio.gather(get_page(1), get_page(-1))
+    if current is None or history is None:
+        return None
+    history_pages = [-page for page in range(min(page_total(history, mode), max_pages), 1, -1)]
+    current_pages = list(range(2, min(page_total(current, mode), max_pages) + 1))
+    other_pages = history_pages + current_pages
+
+    order = other_pages
+    if scheduler is not None:
+        order = [page for _, page in scheduler.by_priority([(mode, page) for page in other_pages])]
+        # Pages the schedule no longer has are not polled anymore
+        for key in list(scheduler.next_due):
+            if key[0] == mode and key[1] not in other_pages + [-1, 1]:
+                scheduler.forget(key)
+    results = dict(zip(order, await asyncio.gather(*(get_page(page) for page in order))))
+    pages = [results[page] for page in other_pages]
+
+    if not cache.get(unsaved):
+        return None
+    pages = pages[:len(history_pages)] + [history, current] + pages[len(history_pages):]
+    merged = merge_pages(mode, [data for data in pages if data is not None])
+    cache.pop(unsaved)
+    return merged
@@ -0,0 +1,40 @@
+import os
+import re
+import timeit
+from combined_arrival_code import extract_arrival_data
+from schedule_parser import extract_schedule
+
+# Benchmark of the lxml schedule parser against extract_arrival_data on the checked-in
+# arrival_schedule_cleaned.html, and on the same rows repeated to a larger page to show
+# how the old per-row soup.find() grows with the row count
+file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'arrival_schedule_cleaned.html')
+
+with open(file_path, 'r', encoding='utf-8') as file:
+    html_content = file.read()
+
+
+# Function to repeat the table rows (with fresh modal ids) until the page has about n rows
+def enlarge_page(html, n):
+    head, rest = html.split('<tbody class="dumb-pager-items">', 1)
+    rows, tail = rest.split('</tbody>', 1)
+    copies = []
+    for copy in range(max(1, n // rows.count('<tr '))):
+        copies.append(re.sub(r'flight(\d+)', lambda m: f"flight{copy}x{m.group(1)}", rows))
+    return head + '<tbody class="dumb-pager-items">' + ''.join(copies) + '</tbody>' + tail
+
+
+# Function to time both parsers on a page and check they agree
+def compare(label, html, number):
+    old_result = extract_arrival_data(html)
+    new_result = extract_schedule(html, 'arrival')
+    assert old_result == new_result, "Parsers disagree"
+
+    old_time = timeit.timeit(lambda: extract_arrival_data(html), number=number) / number
+    new_time = timeit.timeit(lambda: extract_schedule(html, 'arrival'), number=number) / number
+    print(f"{label}: {len(new_result)} rows, BeautifulSoup {old_time * 1000:.2f} ms, "
+          f"lxml index {new_time * 1000:.2f} ms ({old_time / new_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    compare("arrival_schedule_cleaned.html", html_content, 20)
+    compare("Enlarged page", enlarge_page(html_content, 500), 2)
@@ -0,0 +1,124 @@
+import lxml.etree
+import lxml.html
+
+# Fast parser for the vilnius-airport.lt flights schedule table (pip install lxml).
+# The page is parsed once with lxml, and every modal the rows point to is read once into
+# a {modal id: {label: value}} index, so each row does dictionary lookups instead of
+# soup.find() over the whole document and two modal.find() calls per field.
+
+# Column holding the other airport and the airline, per direction
+endpoint_labels = {'arrival': 'Arrives from', 'departure': 'Departs to'}
+
+
+# Function to return the stripped text of the first <tag class="css_class"> inside element, or None
+def element_text(element, tag, css_class):
+    if element is None:
+        return None
+    for child in element.iter(tag):
+        if css_class in child.get('class', '').split():
+            return child.text_content().strip()
+    return None
+
+
+# Function to read every "<span>Label:</span> <span>value</span>" pair of a modal into a dict
+def modal_fields(modal):
+    fields = {}
+    for span in modal.iter('span'):
+        if len(span) or not span.text:
+            continue
+        value = next(span.itersiblings('span'), None)
+        if value is not None:
+            fields.setdefault(span.text, value.text_content().strip())
+    return fields
+
+
+# Function to build the {modal id: fields} index for the modals referenced by rows, in one pass
+def modal_index(root, modal_ids):
+    index = {}
+    for div in root.iter('div'):
+        modal_id = div.get('id')
+        if modal_id in modal_ids and modal_id not in index:
+            index[modal_id] = modal_fields(div)
+    return index
+
+
+# Function to parse a cleaned schedule snippet (as made by get_clean_html) into the same dicts as
+# extract_arrival_data / extract_departure_data in combined_arrival_code.py / combined_departure_code.py
+def extract_schedule(html, direction):
+    return extract_rows(lxml.html.document_fromstring(html), direction)
+
+
+# Function to parse a full schedule page straight from the response bytes. The table is found by
+# its tbody.dumb-pager-items class rather than by line numbers, so a longer or shorter page header
+# doesn't matter, and the page is parsed once with no intermediate string copies.
+def extract_page(content, direction):
+    root = lxml.html.document_fromstring(content)
+
+    # Struck-out old values (<del>) are dropped with their text, keeping the text after them
+    lxml.etree.strip_elements(root, 'del', with_tail=False)
+    return extract_rows(root, direction)
+
+
+# Function to read the schedule rows of a parsed document
+def extract_rows(root, direction):
+    rows = root.xpath('//tbody[contains(concat(" ", normalize-space(@class), " "), " dumb-pager-items ")]/tr')
+    modals = modal_index(root, {row.get('data-target', '').replace('#', '') for row in rows})
+    endpoint_label = endpoint_labels[direction]
+
+    flights = []
+    for row in rows:
+        modal = modals.get(row.get('data-target', '').replace('#', ''))
+        if modal is None:
+            continue
+        cells = {cell.get('data-label'): cell for cell in row.iterchildren('td')}
+
+        estimated_time_text = element_text(cells.get('Estimated time'), 'span', 'bold-lg')
+        estimated_date_text = element_text(cells.get('Estimated time'), 'span', 'light-sm')
+        estimated_time = f"{estimated_date_text} {estimated_time_text}" if estimated_time_text is not None and estimated_date_text is not None else None
+        endpoint = element_text(cells.get(endpoint_label), 'span', 'bold-lg')
+        airline = element_text(cells.get(endpoint_label), 'span', 'light-sm')
+        flight_number = element_text(cells.get('Flight number'), 'a', 'bold-lg')
+        status = modal.get('Status:')
+
+        if direction == 'arrival':
+            time = element_text(cells.get('Time'), 'span', 'light-sm')
+            arrival_time = modal.get('Arrival Time:')
+            scheduled_date = f"{time} {arrival_time}" if time and arrival_time else None
+
+            if status == "On time" or not status:
+                estimated_time = scheduled_date
+
+            flights.append({
+                "Time": time,
+                "Estimated Time": estimated_time,
+                "Scheduled Time": scheduled_date,
+                "Arrives From": endpoint,
+                "Airline": airline,
+                "Flight Number": flight_number,
+                "Departs To": modal.get('Departs to:'),
+                "Arrival Time": arrival_time,
+                "Landed": modal.get('Landed:'),
+                "Status": status,
+            })
+        else:
+            # If the time is empty in the row, it's only shown inside the modal
+            time = element_text(cells.get('Time'), 'span', 'bold-lg')
+            if time == '':
+                time = modal.get('Departure Time:', time)
+            date = element_text(cells.get('Time'), 'span', 'light-sm')
+            scheduled_date = f"{date} {time}"
+
+            # If no estimated time, use the scheduled time
+            if not estimated_time:
+                estimated_time = scheduled_date
+
+            flights.append({
+                "Time": time,
+                "Estimated Time": estimated_time,
+                "Scheduled Time": scheduled_date,
+                "Departs To": endpoint,
+                "Airline": airline,
+                "Flight Number": flight_number,
+                "Status": status,
+            })
+    return flights
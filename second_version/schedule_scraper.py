@@ -0,0 +1,196 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+import requests
+from bs4 import BeautifulSoup
+from fake_useragent import UserAgent
+from schedule_parser import extract_page, extract_schedule
+
+# One scraper for both directions of the vilnius-airport.lt flights schedule. Arrival and
+# departure pages are fetched concurrently over one session, paced by a shared rate limiter,
+# and all rows go through one connection into a single flights table with a direction column.
+base_url = "https://www.vilnius-airport.lt/en/before-the-flight/flights-information/flights-schedule?direction={direction}&destination=&date-from={date_from}&date-to=&page={page}"
+db_file_path = r"C:\Users\zabit\Documents\GitHub\planespotting-time-finder\second_version\flights.db"
+
+directions = ('arrival', 'departure')
+pages = range(1, 11)
+
+# Minimum time between the starts of two requests to the site (the old scripts waited 30 s
+# between pages of one direction, so two directions at 15 s keep the same load per cycle)
+request_interval = 15
+
+# Pause between two full cycles over both directions
+cycle_pause = 900
+
+# How rows are found in a page: 'direct' parses the response bytes once and finds the table by
+# its class; 'clean_html' is the old serialize-and-cut-by-line-number path
+extraction_mode = 'direct'
+
+# Shared schema for both directions. endpoint is the other airport ("Arrives from" for
+# arrivals, "Departs to" for departures); landed is only shown for arrivals.
+schedule_table = '''
+    CREATE TABLE IF NOT EXISTS flights (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        direction TEXT,
+        scheduled_date TEXT,
+        estimated_time TEXT,
+        endpoint TEXT,
+        airline TEXT,
+        flight_number TEXT,
+        landed TEXT,
+        status TEXT,
+        UNIQUE (direction, scheduled_date, endpoint, airline, flight_number)
+    );
+
+    -- Append-only history: one row per changed column of an updated flight
+    CREATE TABLE IF NOT EXISTS flight_events (
+        id INTEGER PRIMARY KEY,
+        flight_id INTEGER,
+        observed_time INTEGER,
+        column_name TEXT,
+        old_value TEXT,
+        new_value TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_flight_events_flight ON flight_events (flight_id, observed_time);
+    CREATE INDEX IF NOT EXISTS idx_flight_events_column ON flight_events (column_name, observed_time);
+'''
+
+
+# Thread-safe pacing: each request starts at least interval seconds after the previous one
+class RateLimiter:
+    def __init__(self, interval, clock=time.monotonic, sleep=time.sleep):
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.next_start = 0
+
+    def wait(self):
+        with self.lock:
+            delay = self.next_start - self.clock()
+            if delay > 0:
+                self.sleep(delay)
+            self.next_start = self.clock() + self.interval
+
+
+# Function to cut the schedule table and its modals out of a full page, the way get_clean_html did
+def clean_html(content):
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Remove all <del> tags
+    for del_tag in soup.find_all('del'):
+        del_tag.decompose()
+
+    # Extract the desired HTML portion
+    lines = str(soup).splitlines()
+    start_line = 1000 + 74
+    end_line = None
+    for i, line in enumerate(lines):
+        if '<nav aria-label="navigation" class="text-center">' in line:
+            end_line = i
+            break
+
+    return '\n'.join(line.lstrip() for line in lines[start_line:end_line])
+
+
+# Function to fetch and parse one page of one direction; returns None if the request failed
+def fetch_page(session, limiter, direction, page, date_from):
+    url = base_url.format(direction=direction, date_from=date_from, page=page)
+    limiter.wait()
+    try:
+        response = session.get(url, timeout=30)
+    except requests.exceptions.RequestException as e:
+        print(f"Failed to retrieve {direction} page {page}: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"Failed to retrieve {direction} page {page}. Status code: {response.status_code}")
+        return None
+    if extraction_mode == 'direct':
+        return extract_page(response.content, direction)
+    return extract_schedule(clean_html(response.content), direction)
+
+
+# Function to normalize strings for comparison (handles None and strips whitespace)
+def normalize_string(value):
+    return value.strip() if value else ""
+
+
+# Function to save the flights of one page, printing what was added or changed and
+# recording every changed column in flight_events in the same transaction
+def save_to_database(conn, direction, flights):
+    endpoint_key = 'Arrives From' if direction == 'arrival' else 'Departs To'
+    observed_time = int(time.time())
+    cursor = conn.cursor()
+    for flight in flights:
+        key = (direction, flight["Scheduled Time"], flight[endpoint_key], flight["Airline"], flight["Flight Number"])
+        cursor.execute('''
+            SELECT id, estimated_time, landed, status FROM flights
+            WHERE direction = ? AND scheduled_date IS ? AND endpoint IS ? AND airline IS ? AND flight_number IS ?
+        ''', key)
+        existing = cursor.fetchone()
+
+        new_values = (flight["Estimated Time"], flight.get("Landed"), flight["Status"])
+        if existing:
+            changes = [(name, column, old, new)
+                       for name, column, old, new in zip(("Estimated Time", "Landed", "Status"), ("estimated_time", "landed", "status"),
+                                                         existing[1:], new_values)
+                       if normalize_string(old) != normalize_string(new)]
+            if changes:
+                cursor.execute('UPDATE flights SET estimated_time = ?, landed = ?, status = ? WHERE id = ?',
+                               new_values + (existing[0],))
+                cursor.executemany('''
+                    INSERT INTO flight_events (flight_id, observed_time, column_name, old_value, new_value)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(existing[0], observed_time, column, old, new) for name, column, old, new in changes])
+                updates = [f"{name}: {old} -> {new}" for name, column, old, new in changes]
+                print(f"Flight {flight['Flight Number']} (Scheduled: {flight['Scheduled Time']}): Updated -> {', '.join(updates)}")
+        else:
+            cursor.execute('''
+                INSERT INTO flights (direction, scheduled_date, endpoint, airline, flight_number, estimated_time, landed, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', key + new_values)
+            print(f"Added new {direction}: {flight['Flight Number']} (Scheduled: {flight['Scheduled Time']})")
+    conn.commit()
+
+
+# Function to run one cycle over all pages of both directions. Pages are fetched and parsed on
+# worker threads; this thread writes each page to the database as soon as it arrives.
+def scrape_cycle(conn, session, limiter, date_from=None):
+    date_from = date_from or date.today().isoformat()
+    with ThreadPoolExecutor(max_workers=len(directions)) as executor:
+        futures = {executor.submit(fetch_page, session, limiter, direction, page, date_from): (direction, page)
+                   for page in pages for direction in directions}
+        for future in as_completed(futures):
+            direction, page = futures[future]
+            flights = future.result()
+            if flights is not None:
+                print(f"Processed {direction} page {page}: {len(flights)} flights")
+                save_to_database(conn, direction, flights)
+
+
+def main():
+    conn = sqlite3.connect(db_file_path)
+    conn.executescript(schedule_table)
+
+    session = requests.Session()
+    session.headers['User-Agent'] = UserAgent().firefox  # Random Firefox user agent
+    limiter = RateLimiter(request_interval)
+
+    # Infinite loop to run the scraper indefinitely
+    try:
+        while True:
+            scrape_cycle(conn, session, limiter)
+
+            # Add a delay after processing all pages to avoid overwhelming the server
+            print(f"Waiting for {cycle_pause // 60} minutes before the next run...")
+            time.sleep(cycle_pause)
+    finally:
+        session.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
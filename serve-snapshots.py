@@ -0,0 +1,42 @@
+import hashlib
+import os
+import sys
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-in for the airport.json API: serves the checked-in airport_{mode}.json
+# snapshots so read-api.py can be run against it by setting api_root to http://127.0.0.1:8024
+snapshot_dir = os.path.dirname(os.path.abspath(__file__))
+port = int(sys.argv[1]) if len(sys.argv) > 1 else 8024
+
+class SnapshotHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        mode = parse_qs(url.query).get('plugin-setting[schedule][mode]', ['arrivals'])[0]
+        file_path = os.path.join(snapshot_dir, f"airport_{os.path.basename(mode)}.json")
+        if url.path != '/common/v1/airport.json' or not os.path.exists(file_path):
+            self.send_error(404)
+            return
+
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', formatdate(os.path.getmtime(file_path), usegmt=True))
+        self.end_headers()
+        self.wfile.write(body)
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(('127.0.0.1', port), SnapshotHandler)
+    print(f"Serving snapshots from {snapshot_dir} on http://127.0.0.1:{port}")
+    server.serve_forever()
@@ -0,0 +1,81 @@
+import bisect
+import gzip
+import json
+import os
+import time
+import zlib
+
+# Append-only snapshot archive.
+# Every snapshot is one newline-terminated JSON record {"time": ..., "mode": ..., "data": ...}
+# compressed as its own gzip member, so the archive is a valid multi-member .gz file that
+# `gzip -dc` turns into newline-delimited JSON. A tab-separated index next to it stores
+# "time, mode, offset, length" per record, which lets a time range be read back by seeking
+# straight to its records instead of decompressing the whole archive.
+
+
+# Function to get the path of the offset index belonging to an archive
+def index_path(archive_path):
+    return archive_path + '.idx'
+
+
+# Function to append one snapshot to the archive and its index
+def append_snapshot(archive_path, mode, data, timestamp=None):
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    record = json.dumps({'time': timestamp, 'mode': mode, 'data': data}, ensure_ascii=False, separators=(',', ':'))
+    member = gzip.compress((record + '\n').encode('utf-8'), mtime=0)
+
+    # The record is written before its index line, so a crash can only leave an unindexed tail
+    with open(archive_path, 'ab') as f:
+        offset = f.tell()
+        f.write(member)
+    with open(index_path(archive_path), 'a', encoding='utf-8') as f:
+        f.write(f"{timestamp}\t{mode}\t{offset}\t{len(member)}\n")
+    return offset
+
+
+# Function to read the index as a list of (time, mode, offset, length), in archive order
+def read_index(archive_path):
+    if not os.path.exists(index_path(archive_path)):
+        return []
+    entries = []
+    with open(index_path(archive_path), 'r', encoding='utf-8') as f:
+        for line in f:
+            timestamp, mode, offset, length = line.rstrip('\n').split('\t')
+            entries.append((int(timestamp), mode, int(offset), int(length)))
+    return entries
+
+
+# Function to rebuild a lost or damaged index by scanning every gzip member of the archive
+def rebuild_index(archive_path):
+    with open(archive_path, 'rb') as f:
+        content = memoryview(f.read())
+    lines = []
+    offset = 0
+    while offset < len(content):
+        # wbits 16 + MAX_WBITS reads exactly one gzip member and leaves the rest as unused_data
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        record = decompressor.decompress(content[offset:])
+        length = len(content) - offset - len(decompressor.unused_data)
+        header = json.loads(record)
+        lines.append(f"{header['time']}\t{header['mode']}\t{offset}\t{length}\n")
+        offset += length
+    with open(index_path(archive_path), 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+
+
+# Function to yield (time, mode, record) for the snapshots with start <= time < end.
+# record is the raw JSON line of the snapshot; pass it to json.loads or to a streaming reader.
+def iter_snapshots(archive_path, start=None, end=None, mode=None):
+    entries = read_index(archive_path)
+    times = [entry[0] for entry in entries]
+    first = bisect.bisect_left(times, start) if start is not None else 0
+    last = bisect.bisect_left(times, end) if end is not None else len(entries)
+    if first >= last:
+        return
+
+    with open(archive_path, 'rb') as f:
+        for timestamp, entry_mode, offset, length in entries[first:last]:
+            if mode is not None and entry_mode != mode:
+                continue
+            f.seek(offset)
+            yield timestamp, entry_mode, gzip.decompress(f.read(length))
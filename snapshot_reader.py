@@ -0,0 +1,191 @@
+import codecs
+import json
+import re
+
+# ijson is optional: when installed it does the incremental parsing, otherwise
+# the small scanner below walks the document chunk by chunk
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Errors raised for a snapshot that isn't valid JSON (e.g. one caught while it's being written),
+# whichever parser reads it
+snapshot_errors = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson is not None else ())
+
+# Keys leading from the top of an airport.json response to the plugin blocks and the schedule block
+plugin_data_path = ('result', 'response', 'airport', 'pluginData')
+schedule_path = plugin_data_path + ('schedule',)
+
+_decoder = json.JSONDecoder()
+_non_space = re.compile(r'\S')
+_structural = re.compile(r'["{}\[\]]')
+_string = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+
+
+# Function to yield the flights of a schedule snapshot one by one, without
+# building the rest of the document (weather, runways, flightdiary, ...)
+def iter_schedule_flights(f, mode, chunk_size=65536):
+    if ijson is not None:
+        prefix = '.'.join(schedule_path + (mode, 'data', 'item'))
+        yield from ijson.items(f, prefix, use_float=True)
+        return
+    yield from iter_array_items(f, schedule_path + (mode, 'data'), chunk_size)
+
+
+# Function to move the scanner to the value found under a path of object keys,
+# skipping everything before it without decoding
+def _seek_path(scanner, path):
+    for key in path:
+        scanner.expect('{')
+        while True:
+            if scanner.peek() == '}':
+                raise KeyError(key)
+            name = scanner.read_string()
+            scanner.expect(':')
+            if name == key:
+                break
+            scanner.skip_value()
+            if scanner.expect(',}') == '}':
+                raise KeyError(key)
+
+
+# Function to decode only the given keys of the object found under a path of object keys
+# (e.g. the weather and runways of pluginData) into a dict; missing keys are left out.
+# The rest of the document, the schedule included, is skipped without being decoded.
+def read_object_fields(f, path, keys, chunk_size=65536):
+    scanner = _StreamScanner(f, chunk_size)
+    fields = {}
+    try:
+        _seek_path(scanner, path)
+    except KeyError:
+        return fields
+    if scanner.expect('{n') == 'n':
+        return fields
+    if scanner.peek() == '}':
+        return fields
+    while len(fields) < len(keys):
+        name = scanner.read_string()
+        scanner.expect(':')
+        if name in keys:
+            fields[name] = scanner.decode_value()
+        else:
+            scanner.skip_value()
+        if scanner.expect(',}') == '}':
+            break
+    return fields
+
+
+# Function to yield the items of the array found under a path of object keys.
+# Everything before the array is skipped without being decoded, and only one
+# item plus one chunk of text is held in memory at a time.
+def iter_array_items(f, path, chunk_size=65536):
+    scanner = _StreamScanner(f, chunk_size)
+    _seek_path(scanner, path)
+
+    # A missing list (null) is treated as an empty one
+    if scanner.peek() == 'n':
+        scanner.decode_value()
+        return
+    scanner.expect('[')
+    if scanner.peek() == ']':
+        return
+    while True:
+        yield scanner.decode_value()
+        if scanner.expect(',]') == ']':
+            return
+
+
+# Minimal pull scanner over a text or binary file, reading it in chunks
+class _StreamScanner:
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    # Read the next chunk, dropping the part of the buffer that was already consumed
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if isinstance(chunk, bytes):
+            chunk = self.decoder.decode(chunk)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def fail(self, message):
+        raise json.JSONDecodeError(message, self.buf, self.pos)
+
+    # Return the next non-whitespace character without consuming it
+    def peek(self):
+        while True:
+            match = _non_space.search(self.buf, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self.fill():
+                self.fail('Unexpected end of JSON data')
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            self.fail(f"Expected one of {chars!r}")
+        self.pos += 1
+        return char
+
+    def read_string(self, decode=True):
+        if self.peek() != '"':
+            self.fail('Expected a string')
+        while True:
+            match = _string.match(self.buf, self.pos)
+            if match:
+                self.pos = match.end()
+                return json.loads(match.group()) if decode else None
+            if not self.fill():
+                self.fail('Unterminated string')
+
+    def decode_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number cut at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    # Skip over a value by matching brackets, without decoding it
+    def skip_value(self):
+        if self.peek() not in '{[':
+            self.decode_value()
+            return
+        depth = 0
+        while True:
+            match = _structural.search(self.buf, self.pos)
+            if not match:
+                self.pos = len(self.buf)
+                if not self.fill():
+                    self.fail('Unexpected end of JSON data')
+                continue
+            char = match.group()
+            if char == '"':
+                self.pos = match.start()
+                self.read_string(decode=False)
+                continue
+            self.pos = match.end()
+            depth += 1 if char in '{[' else -1
+            if depth == 0:
+                return
@@ -0,0 +1,93 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# watchdog is optional: without it wait_for_change falls back to plain sleeping
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+# Seconds to wait after a file event so the writer can finish the file
+settle_delay = 1
+
+
+# Function to create the table that remembers the last ingested version of each snapshot file
+def create_snapshot_state_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS snapshot_state (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            sha256 TEXT,
+            processed_time TEXT
+        )
+    ''')
+
+
+# Function to remember the version of a snapshot file that was just ingested
+def save_snapshot_state(cursor, state):
+    cursor.execute('''
+        INSERT INTO snapshot_state (path, size, mtime_ns, sha256, processed_time)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (path) DO UPDATE
+        SET size=excluded.size, mtime_ns=excluded.mtime_ns, sha256=excluded.sha256, processed_time=excluded.processed_time
+    ''', state + (datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),))
+
+
+# Function to read a snapshot file only if it changed since it was last ingested.
+# A matching size and mtime skips the read entirely; otherwise the content hash
+# decides, so a rewrite with identical data is still treated as unchanged.
+# Returns (content, state), with content None when the file is unchanged.
+def read_if_changed(cursor, path):
+    stat = os.stat(path)
+    cursor.execute('SELECT size, mtime_ns, sha256 FROM snapshot_state WHERE path=?', (path,))
+    stored = cursor.fetchone()
+    if stored and stored[0] == stat.st_size and stored[1] == stat.st_mtime_ns:
+        return None, None
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    state = (path, stat.st_size, stat.st_mtime_ns, hashlib.sha256(content).hexdigest())
+
+    if stored and stored[2] == state[3]:
+        # Rewritten with the same content: store the new stat so the next check is stat-only
+        save_snapshot_state(cursor, state)
+        return None, None
+    return content, state
+
+
+# Event handler that wakes up the waiting loop when one of the watched files changes
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, paths, changed):
+        self.paths = paths
+        self.changed = changed
+
+    def on_any_event(self, event):
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path and os.path.abspath(path) in self.paths:
+                self.changed.set()
+
+
+# Function to wait until one of the files changes or the timeout passes
+def wait_for_change(paths, timeout):
+    if Observer is None:
+        time.sleep(timeout)
+        return
+
+    changed = threading.Event()
+    handler = _ChangeHandler({os.path.abspath(path) for path in paths}, changed)
+    observer = Observer()
+    for directory in {os.path.dirname(os.path.abspath(path)) for path in paths}:
+        observer.schedule(handler, directory)
+    observer.start()
+    try:
+        if changed.wait(timeout):
+            time.sleep(settle_delay)
+    finally:
+        observer.stop()
+        observer.join()
@@ -0,0 +1,110 @@
+import numpy as np
+from fnmatch import fnmatchcase
+from best_window import find_best_windows_from_counts
+
+# Weighted best-window search: instead of counting flights, every flight adds its weight, so one
+# A380 can beat ten A320s. A flight's weight is the product of the rules it matches (1 when it
+# matches none, 0 drops it). Rules are glob patterns per column; model codes come both as ICAO
+# (A388) and IATA (388) codes in the payload, so list both.
+weight_rules = {
+    'model_code': {'A38*': 10, '388': 10, 'B74*': 8, '74*': 8, 'A35*': 4, '359': 4, 'B78*': 4, '78*': 4,
+                   'AN*': 5, 'IL*': 5, 'C130': 5, 'A400': 5},
+    'airline': {},
+    'registration': {},
+    'flight_type': {},
+    'origin_or_destination': {},
+}
+
+# Vilnius airport, for the daylight constraint
+airport_latitude = 54.6341
+airport_longitude = 25.2858
+
+# Sun elevation (degrees) above which a movement counts as in daylight; -0.833 is sunrise/sunset
+min_sun_elevation = -0.833
+
+
+# Function to weigh every flight of a DataFrame by the rules. Each pattern is matched once per
+# distinct value of its column, not once per flight.
+def flight_weights(flights, rules=weight_rules):
+    weights = np.ones(len(flights))
+    for column, patterns in rules.items():
+        if not patterns or column not in flights.columns:
+            continue
+        values = flights[column].fillna('').astype(str)
+        factors = {}
+        for value in values.unique():
+            factor = 1.0
+            for pattern, weight in patterns.items():
+                if fnmatchcase(value, pattern):
+                    factor *= weight
+            factors[value] = factor
+        weights *= values.map(factors).to_numpy(dtype=float)
+    return weights
+
+
+# Function to compute the sun's elevation (degrees) at epoch seconds, vectorized. Uses the
+# low-precision solar position from the Astronomical Almanac, good to about a hundredth of a degree.
+def sun_elevation(epoch_seconds, latitude=airport_latitude, longitude=airport_longitude):
+    days = (np.asarray(epoch_seconds, dtype=float) - 946728000) / 86400  # since 2000-01-01 12:00 UTC
+    anomaly = np.radians(357.529 + 0.98560028 * days)
+    longitude_sun = np.radians(280.459 + 0.98564736 * days + 1.915 * np.sin(anomaly) + 0.020 * np.sin(2 * anomaly))
+    obliquity = np.radians(23.439 - 0.00000036 * days)
+    right_ascension = np.arctan2(np.cos(obliquity) * np.sin(longitude_sun), np.cos(longitude_sun))
+    declination = np.arcsin(np.sin(obliquity) * np.sin(longitude_sun))
+    sidereal_time = np.radians((280.46061837 + 360.98564736629 * days) % 360 + longitude)
+    hour_angle = sidereal_time - right_ascension
+    latitude = np.radians(latitude)
+    return np.degrees(np.arcsin(np.sin(latitude) * np.sin(declination)
+                                + np.cos(latitude) * np.cos(declination) * np.cos(hour_angle)))
+
+
+# Function to enforce a minimum gap (seconds) between the movements that count, in one pass over
+# sorted times: of two movements closer than min_gap, only the heavier one keeps its weight (the
+# earlier one on a tie), since there's only time to photograph one of them.
+def thin_by_gap(sorted_times, weights, min_gap):
+    weights = weights.copy()
+    kept = None
+    for i in np.flatnonzero(weights > 0):
+        if kept is not None and sorted_times[i] - sorted_times[kept] < min_gap:
+            if weights[i] <= weights[kept]:
+                weights[i] = 0
+                continue
+            weights[kept] = 0
+        kept = i
+    return weights
+
+
+# Function to find the top-k non-overlapping windows with the highest total weight. flights is a
+# DataFrame with time_column in epoch seconds (e.g. load_future_flights' predicted_time) and the
+# columns the rules use. Constraints: flight_types keeps only those types, daylight_only drops
+# movements with the sun below min_sun_elevation and min_gap (minutes) thins close movements.
+# factor_column names a column of per-flight factors to multiply the weights by (e.g. the weather).
+# Returns dicts with start, end (epoch seconds), score, count and the contributing flights.
+def find_weighted_windows(flights, window_minutes, k=1, rules=weight_rules, time_column='predicted_time',
+                          flight_types=None, daylight_only=False, min_gap=0, factor_column=None):
+    flights = flights.dropna(subset=[time_column]).sort_values(time_column, kind='stable')
+    times = flights[time_column].to_numpy(dtype=np.int64)
+    weights = flight_weights(flights, rules)
+    if factor_column is not None:
+        weights *= flights[factor_column].fillna(1).to_numpy(dtype=float)
+    if flight_types is not None:
+        weights[~flights['flight_type'].isin(flight_types).to_numpy()] = 0
+    if daylight_only:
+        weights[sun_elevation(times) < min_sun_elevation] = 0
+    if min_gap:
+        weights = thin_by_gap(times, weights, min_gap * 60)
+
+    counted = weights > 0
+    if not counted.any():
+        return []
+    starts, inverse = np.unique(times[counted], return_inverse=True)
+    windows = find_best_windows_from_counts(starts, np.bincount(inverse, weights=weights[counted]), int(window_minutes * 60), k)
+
+    flights = flights.assign(weight=weights)
+    for window in windows:
+        window['start'] = int(window['start'])
+        window['end'] = int(window['end'])
+        window['score'] = window['count']
+        window['flights'] = flights[counted & (times >= window['start']) & (times < window['end'])]
+        window['count'] = len(window['flights'])
+    return windows